@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+import numpy as np
+from syslog import Syslog
+from working_memory import current_session
+
+
+# Questions whose answer depends on when (or where) they are asked are never served from cache
+DEFAULT_EXCLUDE_PATTERNS = [
+    r"\b(time|date|today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent|news)\b",
+    r"\b(weather|temperature|forecast)\b",
+    r"\b(uptime|running|usage|disk|memory|cpu|battery|ip)\b",
+    r"\b(file|folder|directory|open|read|run|execute|install|delete|create)\b",
+    r"\b(remind|timer|alarm)\b",
+    # Questions about the conversation itself, the answer is only right for this session at this point in it
+    r"\b(earlier|previous(ly)?|last time|again|remember|recap|summari[sz]e|we (talked|discussed|spoke)|"
+    r"i (asked|said|told|mentioned)|you (said|told|mentioned)|our (conversation|chat))\b",
+]
+
+
+class SemanticAnswerCache:
+    """Answers keyed on the question embedding, reused for near-identical questions.
+
+    Entries expire after ttl_seconds, time-sensitive or conversation-referential
+    questions and anything routed to tools are excluded, and hits/misses are
+    counted. Answers are only served back to the session (current_session)
+    that produced them, entries warmed from long-term memory are shared.
+    """
+
+    def __init__(self, embedding_function, threshold=0.92, ttl_seconds=3600, max_entries=512,
+                 exclude_patterns=None, excluded_intents=("tool", "syscom")):
+        self.syslog = Syslog(log_file="logs/answer_cache.log")
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.excluded_intents = set(excluded_intents)
+        patterns = DEFAULT_EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns
+        self._exclude = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self._entries = []
+        self._matrix = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "skipped": 0, "stores": 0, "expired": 0}
+
+    def is_cacheable(self, question, intent=None):
+        if intent in self.excluded_intents:
+            return False
+        return not any(pattern.search(question) for pattern in self._exclude)
+
+    def _embed(self, question):
+        vector = np.asarray(self.embedding_function([question])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _rebuild(self):
+        self._matrix = np.stack([entry["vector"] for entry in self._entries]) if self._entries else None
+
+    def _similarities(self, vector, session, shared=True):
+        similarities = self._matrix @ vector
+        # Another session's answers may have been shaped by its own conversation
+        visible = (None, session) if shared else (session,)
+        foreign = np.array([entry["session"] not in visible for entry in self._entries])
+        similarities[foreign] = -1.0
+        return similarities
+
+    def _drop_expired(self, now):
+        alive = [entry for entry in self._entries if entry["expires_at"] >= now]
+        if len(alive) != len(self._entries):
+            self.stats["expired"] += len(self._entries) - len(alive)
+            self._entries = alive
+            self._rebuild()
+
+    def lookup(self, question, intent=None):
+        if not self.is_cacheable(question, intent):
+            self.stats["skipped"] += 1
+            return None
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            self._drop_expired(now)
+            if self._matrix is None:
+                self.stats["misses"] += 1
+                return None
+            similarities = self._similarities(vector, current_session.get())
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            entry = self._entries[best]
+            entry["hits"] += 1
+            entry["last_hit"] = now
+            self.stats["hits"] += 1
+        self.syslog.log(f"Answer cache hit ({similarities[best]:.3f}) for '{question}' -> '{entry['question']}'", level="INFO")
+        return entry["answer"]
+
+    def store(self, question, answer, intent=None, ttl_seconds=None):
+        if not answer or not self.is_cacheable(question, intent):
+            return
+        vector = self._embed(question)
+        session = current_session.get()
+        now = time.time()
+        with self._lock:
+            self._drop_expired(now)
+            if self._matrix is not None:
+                # Only this session's own entries, rewriting a shared one would hand this answer to everyone
+                similarities = self._similarities(vector, session, shared=False)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    # Same question again, refresh instead of growing
+                    self._entries[best].update(answer=answer, expires_at=now + (ttl_seconds or self.ttl_seconds))
+                    return
+            if len(self._entries) >= self.max_entries:
+                coldest = min(range(len(self._entries)), key=lambda i: (self._entries[i]["hits"], self._entries[i]["last_hit"]))
+                self._entries.pop(coldest)
+            self._entries.append({"question": question, "answer": answer, "vector": vector, "session": session,
+                                  "hits": 0, "last_hit": now, "expires_at": now + (ttl_seconds or self.ttl_seconds)})
+            self._rebuild()
+            self.stats["stores"] += 1
+
+    def warm(self, collection, limit=200, min_hits=1):
+        # Seed from answers in rigel_memory that have already been retrieved at least min_hits times
+        found = collection.get(where={"hits": {"$gte": min_hits}}, limit=limit, include=["metadatas"])
+        pairs = []
+        for metadata in found.get("metadatas") or []:
+            metadata = metadata or {}
+            question, answer = metadata.get("question"), metadata.get("answer")
+            if question and answer and self.is_cacheable(question):
+                pairs.append((question, answer))
+        if not pairs:
+            return
+        vectors = np.asarray(self.embedding_function([question for question, _ in pairs]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        now = time.time()
+        with self._lock:
+            room = max(0, self.max_entries - len(self._entries))
+            for (question, answer), vector in list(zip(pairs, vectors))[:room]:
+                self._entries.append({"question": question, "answer": answer, "vector": vector, "session": None,
+                                      "hits": 0, "last_hit": now, "expires_at": now + self.ttl_seconds})
+            self._rebuild()
+        self.syslog.log(f"Answer cache warmed with {min(room, len(pairs))} entries from {collection.name}", level="INFO")
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
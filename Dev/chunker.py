@@ -0,0 +1,85 @@
+import re
+
+
+# Lines that start a new unit in a command guide: markdown or numbered headings,
+# man-style ALL CAPS section names, and "command - description" entries
+_HEADING_RE = re.compile(r"^(?:#{1,6}\s+\S|\d+(?:\.\d+)*\.?\s+[A-Z]\S*|[A-Z][A-Z0-9 /&()_-]{2,60}$)")
+_COMMAND_RE = re.compile(r"^[a-z][\w.+-]*(?:\s+-{1,2}[\w-]+)*\s+[-–—:]\s+\S")
+
+
+def _boundaries(text):
+    starts = [0]
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if offset and stripped and (_HEADING_RE.match(stripped) or _COMMAND_RE.match(stripped)):
+            starts.append(offset)
+        offset += len(line)
+    return starts
+
+
+def _snap(text, position, lower):
+    # Prefer to cut at a line break, then at a space, but never before lower
+    for separator in ("\n", " "):
+        cut = text.rfind(separator, lower, position)
+        if cut > lower:
+            return cut + 1
+    return position
+
+
+def _window(text, start, end, max_chars, overlap):
+    spans = []
+    while start < end:
+        stop = end if end - start <= max_chars else _snap(text, start + max_chars, start + max_chars // 2)
+        spans.append((start, stop))
+        if stop >= end:
+            break
+        next_start = max(stop - overlap, start + 1)
+        space = text.find(" ", next_start, stop)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+def chunk_text(text, max_chars=800, overlap=120, min_chars=200):
+    """Splits a page into [(start, end, chunk_text)] along its headings and command entries.
+
+    Sections shorter than min_chars (a bare heading, say) are merged with the
+    next one however long it is, so they open its first window instead of
+    becoming a chunk of their own. Sections longer than max_chars are cut with
+    a sliding window that overlaps by about overlap characters. Offsets index
+    into the original page text.
+    """
+    starts = _boundaries(text) + [len(text)]
+    sections = []
+    for start, end in zip(starts, starts[1:]):
+        if sections and sections[-1][1] - sections[-1][0] < min_chars:
+            sections[-1] = (sections[-1][0], end)
+        else:
+            sections.append((start, end))
+
+    chunks = []
+    for start, end in sections:
+        for span_start, span_end in _window(text, start, end, max_chars, overlap):
+            piece = text[span_start:span_end]
+            stripped = piece.strip()
+            if not stripped:
+                continue
+            span_start += len(piece) - len(piece.lstrip())
+            chunks.append((span_start, span_start + len(stripped), stripped))
+    return chunks
+
+
+def stitch(chunks):
+    """Joins chunks of one page, given as [(start, end, text)] in order, without repeating their overlap."""
+    parts = []
+    last_end = None
+    for start, end, text in chunks:
+        if last_end is not None and start < last_end:
+            text = text[last_end - start:]
+            if not text.strip():
+                continue
+        elif last_end is not None:
+            parts.append("\n")
+        parts.append(text)
+        last_end = max(end, last_end or 0)
+    return "".join(parts)
@@ -0,0 +1,167 @@
+import re
+import threading
+from syslog import Syslog
+
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+DEFAULT_BUDGETS = {
+    "summary": 200,
+    "working": 600,
+    "long_term": 400,
+    "syscom": 800,
+}
+
+
+def count_tokens(text):
+    # Close enough to the Llama tokenizer for budgeting, and needs no model files
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def fit_to_budget(text, budget, keep_tail=False):
+    """Cuts text down to roughly budget tokens, keeping the beginning (or the end)."""
+    if not text or count_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    matches = list(_TOKEN_RE.finditer(text))
+    if keep_tail:
+        return "... " + text[matches[-budget].start():]
+    return text[:matches[budget - 1].end()] + " ..."
+
+
+def _normalize(text):
+    return " ".join(_TOKEN_RE.findall((text or "").lower()))
+
+
+def _overlap(a, b):
+    a_tokens, b_tokens = set(a.split()), set(b.split())
+    if not a_tokens or not b_tokens:
+        return 0.0
+    return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
+
+
+def format_turn(question, answer):
+    return f"Question_User: {question}\nAnswer_Rigel: {answer}"
+
+
+class ContextAssembler:
+    """Builds the memory context for a prompt under per-section token budgets.
+
+    The newest keep_recent working-memory turns are sent verbatim. Older ones
+    are folded into a rolling summary that is extended on a background thread
+    as turns age out, so the summary never sits on the turn's critical path.
+    Long-term memories that repeat something already in the prompt are dropped.
+    """
+
+    def __init__(self, budgets=None, keep_recent=4, summarizer=None, duplicate_overlap=0.8):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.duplicate_overlap = duplicate_overlap
+        self.syslog = Syslog(log_file="logs/context_assembler.log")
+        self._summary = ""
+        self._folded = set()
+        self._lock = threading.Lock()
+        self._summarizing = False
+
+    def _is_duplicate(self, key, seen):
+        return any(key == other or _overlap(key, other) >= self.duplicate_overlap for other in seen)
+
+    def _dedupe(self, turns, seen):
+        unique = []
+        for question, answer in turns:
+            key = _normalize(f"{question} {answer}")
+            if self._is_duplicate(key, seen):
+                continue
+            seen.append(key)
+            unique.append((question, answer))
+        return unique
+
+    def _take(self, turns, budget):
+        # Fills the budget in the given priority order, trimming the last turn that only partly fits
+        taken = []
+        remaining = budget
+        for question, answer in turns:
+            text = format_turn(question, answer)
+            cost = count_tokens(text)
+            if cost > remaining:
+                if remaining > 20:
+                    taken.append(fit_to_budget(text, remaining))
+                break
+            taken.append(text)
+            remaining -= cost
+        return taken
+
+    def _extractive_summary(self, previous, turns):
+        questions = "; ".join(question for question, _ in turns)
+        return f"{previous} Earlier the user asked about: {questions}.".strip()
+
+    def _summarize(self, previous, turns):
+        if self.summarizer is None:
+            return self._extractive_summary(previous, turns)
+        transcript = "\n".join(format_turn(q, a) for q, a in turns)
+        prompt = (f"Current summary of the conversation:\n{previous or 'None'}\n\n"
+                  f"New turns:\n{transcript}\n\n"
+                  f"Update the summary to include the new turns in at most {self.budgets['summary']} words. "
+                  f"Reply with the summary only.")
+        return self.summarizer(prompt)
+
+    def _refresh_summary(self, older):
+        with self._lock:
+            if self._summarizing:
+                return
+            # Only turns that aged out since the last pass are folded in. If none of the
+            # folded turns are around any more (memory expired or was reset), start over
+            if self._folded and not self._folded & set(older):
+                self._summary, self._folded = "", set()
+            previous = self._summary
+            new_turns = [turn for turn in older if turn not in self._folded]
+            if not new_turns:
+                return
+            self._summarizing = True
+
+        def work():
+            try:
+                # The extractive fallback only ever appends, so it keeps its newest part
+                summary = fit_to_budget(self._summarize(previous, new_turns), self.budgets["summary"],
+                                        keep_tail=self.summarizer is None)
+                with self._lock:
+                    self._summary = summary
+                    self._folded = (self._folded | set(new_turns)) & set(older)
+            except Exception as e:
+                # The previous summary stays, these turns get folded in on a later pass
+                self.syslog.log(f"Summary refresh failed: {e}", level="ERROR")
+            finally:
+                with self._lock:
+                    self._summarizing = False
+
+        threading.Thread(target=work, name="context-summary", daemon=True).start()
+
+    def assemble(self, working_turns, long_term_turns):
+        working_turns = [tuple(turn) for turn in working_turns]
+        recent = working_turns[-self.keep_recent:] if self.keep_recent else []
+        older = working_turns[:len(working_turns) - len(recent)]
+        if older:
+            self._refresh_summary(older)
+        with self._lock:
+            summary = self._summary if older else ""
+
+        seen = []
+        recent = self._dedupe(reversed(recent), seen)
+        long_term = self._dedupe(long_term_turns, seen)
+
+        sections = []
+        if summary:
+            sections.append(f"Conversation Summary:\n{summary}")
+        working_text = self._take(recent, self.budgets["working"])
+        if working_text:
+            # Selected newest first for the budget, presented oldest first
+            sections.append("Recent Working Memory Context:\n" + "\n\n".join(reversed(working_text)))
+        long_term_text = self._take(long_term, self.budgets["long_term"])
+        if long_term_text:
+            sections.append("Context:\n" + "\n\n".join(long_term_text))
+        return "\n\n".join(sections)
+
+    def fit_syscom(self, context):
+        return fit_to_budget(context, self.budgets["syscom"])
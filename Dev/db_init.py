@@ -1,35 +1,133 @@
-from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
-import chromadb
-from pypdf import PdfReader
+import os
 from syslog import Syslog
+from tracing import traced
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from registry import registry
+from ingest import SyscomIngestor
+from chunker import stitch
 
 
 class VectorDB:
     def __init__(self):
         self.syslog = Syslog(log_file="logs/vector_db.log")
         self.dbName = "rag_syscom"
-        self.dbPath = "chroma_db"
-        self.filepath = "data/syscom.pdf"
+        # Shares the one Chroma client (and store) with the memory collections
+        self.dbPath = "chromadb"
+        # Files and/or directories of PDF, markdown and man pages, separated like PATH
+        self.sources = os.environ.get("RIGEL_SYSCOM_SOURCES", os.pathsep.join(["data/syscom.pdf", "data/syscom"])).split(os.pathsep)
+        self.manifestPath = os.path.join(self.dbPath, f"{self.dbName}_manifest.json")
+        self.lexicalIndexPath = os.path.join(self.dbPath, f"{self.dbName}_bm25.json")
+        self.corpus_digest = None
+        self.ingestor = None
         self.chroma_client = None
         self.collection = None
+        self.lexical_index = None
 
     def loadDataToVectorDB(self):
         try:
-            self.chroma_client = chromadb.PersistentClient(path=self.dbPath)
-            self.collection = self.chroma_client.get_or_create_collection(name=self.dbName)
-            reader = PdfReader(self.filepath)
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:
-                    self.collection.add(documents=[text], ids=[str(i)])
+            self.chroma_client = registry.get("chroma")
+            self.collection = self.chroma_client.get_or_create_collection(name=self.dbName, embedding_function=registry.get("embedding_function"))
+            # Only pages whose text changed since the last start are extracted and embedded again
+            self.ingestor = SyscomIngestor(self.collection, self.sources, self.manifestPath)
+            self.corpus_digest = self.ingestor.sync()
             self.syslog.log("VectorDB Initializaton Success", level="INFO")
         except:
             self.syslog.log("Initializing VectorDB Failed !", level="ERROR")
+        self.loadLexicalIndex()
 
-    def retriever(self, context):
-        results = self.collection.query(query_texts=[context], n_results=3)
-        retrieved_text = "\n".join(results["documents"][0]) if results["documents"] else ""
-        return retrieved_text
+    def loadLexicalIndex(self):
+        # Tokenizing is the expensive part, so the saved index is reused until the corpus fingerprint moves.
+        # The ingestion manifest digest already tracks every page, so the corpus is only read to rebuild
+        if self.collection is None:
+            return
+        try:
+            index = BM25Index.load(self.lexicalIndexPath)
+            fingerprint = self.corpus_digest
+            if index is None or fingerprint is None or index.fingerprint != fingerprint:
+                corpus = self.collection.get(include=["documents"])
+                fingerprint = fingerprint or BM25Index.corpus_fingerprint(corpus["ids"], corpus["documents"])
+                index = BM25Index().build(corpus["ids"], corpus["documents"], fingerprint=fingerprint)
+                index.save(self.lexicalIndexPath)
+                self.syslog.log(f"Lexical index rebuilt over {len(index.ids)} documents", level="INFO")
+            self.lexical_index = index
+        except Exception as e:
+            self.syslog.log(f"Lexical index unavailable, falling back to dense retrieval only: {e}", level="ERROR")
+            self.lexical_index = None
+
+    def _get_chunks(self, ids):
+        if not ids:
+            return {}
+        found = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {item_id: {**(metadata or {}), "text": document or ""}
+                for item_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
 
+    def expand_neighbours(self, chunk_ids, window=1, char_budget=None, chunks=None):
+        """Adds the chunks around each selected one, best-ranked first, while the budget lasts."""
+        chunks = chunks if chunks is not None else self._get_chunks(chunk_ids)
+        if self.ingestor is None:
+            return list(chunk_ids)
+        wanted = {}
+        for item_id in chunk_ids:
+            chunk = chunks.get(item_id, {})
+            if "chunk" in chunk:
+                wanted[item_id] = self.ingestor.neighbour_ids(chunk["source"], chunk["page"], chunk["chunk"], window)
+        chunks.update(self._get_chunks({n for ids in wanted.values() for n in ids if n not in chunks}))
+        selected = list(chunk_ids)
+        used = sum(len(chunks[item_id]["text"]) for item_id in selected if item_id in chunks)
+        for item_id in chunk_ids:
+            for neighbour in wanted.get(item_id, []):
+                if neighbour in selected or neighbour not in chunks:
+                    continue
+                size = len(chunks[neighbour]["text"])
+                if char_budget is not None and used + size > char_budget:
+                    continue
+                selected.append(neighbour)
+                used += size
+        return selected
 
-    
\ No newline at end of file
+    def _render(self, selected, chunks):
+        # Chunks of the same page are put back in page order and their overlaps stitched,
+        # pages keep the order of their best-ranked chunk
+        groups = {}
+        for item_id in selected:
+            chunk = chunks.get(item_id)
+            if chunk is not None:
+                groups.setdefault((chunk.get("source"), chunk.get("page")), []).append(chunk)
+        rendered = []
+        for group in groups.values():
+            group.sort(key=lambda chunk: chunk.get("chunk", 0))
+            runs = [[group[0]]]
+            for chunk in group[1:]:
+                if "chunk" in chunk and chunk["chunk"] == runs[-1][-1].get("chunk", -2) + 1:
+                    runs[-1].append(chunk)
+                else:
+                    runs.append([chunk])
+            rendered.append("\n...\n".join(
+                stitch([(chunk.get("start", 0), chunk.get("end", 0), chunk["text"]) for chunk in run]) if "start" in run[0]
+                else "\n".join(chunk["text"] for chunk in run)
+                for run in runs))
+        return "\n\n".join(rendered)
+
+    @traced()
+    def retriever(self, context, n_results=3, candidates=10, char_budget=2400, expand=0):
+        # Dense and BM25 candidates are fused with reciprocal rank fusion, then the best chunks
+        # are taken until char_budget is spent. expand pulls in that many neighbours on each side
+        dense = self.collection.query(query_texts=[context], n_results=candidates, include=["distances"])
+        dense_ids = dense["ids"][0] if dense["ids"] else []
+        rankings = [dense_ids]
+        if self.lexical_index is not None:
+            rankings.append([item_id for item_id, _ in self.lexical_index.search(context, candidates)])
+        fused = reciprocal_rank_fusion(rankings)[:n_results]
+        chunks = self._get_chunks(fused)
+        selected = []
+        used = 0
+        for item_id in fused:
+            chunk = chunks.get(item_id)
+            if chunk is None or (selected and used + len(chunk["text"]) > char_budget):
+                continue
+            selected.append(item_id)
+            used += len(chunk["text"])
+        if expand:
+            selected = self.expand_neighbours(selected, window=expand, char_budget=char_budget, chunks=chunks)
+        retrieved_text = self._render(selected, chunks)
+        return retrieved_text
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+
+class EmbeddingDiskStore:
+    """Append-only on-disk vector store, read back through a memory map.
+
+    vectors.f32 holds raw float32 rows and keys.txt the matching text hashes,
+    one per line in the same order. Rows are made durable before their keys are
+    written, and on load both files are cut back to the rows that have a key, so
+    a crash between the two writes can't shift later keys onto the wrong rows.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self.dim = None
+        self._rows = {}
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim is None or not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split("\n")
+        keys = []
+        for line in lines:
+            # Stop at a torn or garbled line, nothing after it can be trusted to line up
+            if not re.fullmatch(r"[0-9a-f]{40}", line):
+                break
+            keys.append(line)
+        row_bytes = 4 * self.dim
+        vectors_size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        rows = min(len(keys), vectors_size // row_bytes)
+        if vectors_size != rows * row_bytes or lines != keys[:rows] + [""]:
+            self._repair(keys[:rows], rows * row_bytes)
+        for row, key in enumerate(keys[:rows]):
+            self._rows[key] = row
+
+    def _repair(self, keys, vectors_size):
+        # Rows without a key (or a torn last row) are dropped, keys without a row too
+        with open(self._vectors_path, 'ab') as f:
+            f.truncate(vectors_size)
+        tmp_path = self._keys_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(key + "\n" for key in keys)
+        os.replace(tmp_path, self._keys_path)
+
+    def _matrix(self):
+        if self._mmap is None and self._rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(len(self._rows), self.dim))
+        return self._mmap
+
+    def get(self, key):
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._matrix()[row])
+
+    def put_many(self, items):
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items if key not in self._rows]
+        if not items:
+            return
+        if self.dim is None:
+            self.dim = int(items[0][1].shape[-1])
+            with open(self._meta_path, 'w', encoding='utf-8') as f:
+                json.dump({"dim": self.dim}, f)
+        # Rows first, right after the last keyed row, and on disk before any key points at them
+        with open(self._vectors_path, 'ab') as f:
+            f.truncate(len(self._rows) * 4 * self.dim)
+            for _, vector in items:
+                f.write(vector.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._keys_path, 'a', encoding='utf-8') as f:
+            f.writelines(key + "\n" for key, _ in items)
+        for key, _ in items:
+            self._rows[key] = len(self._rows)
+        self._mmap = None
+
+
+def _model_identity(function):
+    # Vectors from different models must never share a store
+    name = getattr(function, "model_name", None) or getattr(function, "MODEL_NAME", None)
+    identity = type(function).__name__ + (f"-{name}" if isinstance(name, str) else "")
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", identity)
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Content-addressed cache in front of an embedding function.
+
+    Vectors are keyed by a hash of the text and kept in a bounded LRU, optionally
+    backed by an EmbeddingDiskStore in a subdirectory of persist_dir named after
+    the wrapped model. Whatever misses both is embedded in a single call to the
+    wrapped function.
+    """
+
+    def __init__(self, base=None, capacity=4096, persist_dir=None):
+        self.base = base or DefaultEmbeddingFunction()
+        self.capacity = capacity
+        self.disk = EmbeddingDiskStore(os.path.join(persist_dir, _model_identity(self.base))) if persist_dir else None
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "batches": 0}
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [self._key(text) for text in input]
+        vectors = [None] * len(keys)
+        pending = OrderedDict()
+
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    self.stats["hits"] += 1
+                elif self.disk is not None and (vector := self.disk.get(key)) is not None:
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                if vector is not None:
+                    vectors[position] = vector
+                else:
+                    # Duplicates inside one batch are only embedded once
+                    pending.setdefault(key, []).append(position)
+
+        if pending:
+            texts = [input[positions[0]] for positions in pending.values()]
+            embedded = [np.asarray(vector, dtype=np.float32) for vector in self.base(texts)]
+            with self._lock:
+                self.stats["misses"] += len(texts)
+                self.stats["batches"] += 1
+                for (key, positions), vector in zip(pending.items(), embedded):
+                    self._remember(key, vector)
+                    for position in positions:
+                        vectors[position] = vector
+                if self.disk is not None:
+                    self.disk.put_many(zip(pending.keys(), embedded))
+
+        return vectors
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedding_function():
+    # One cache for every collection, so the same question is embedded once per process
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = CachedEmbeddingFunction(
+                capacity=int(os.environ.get("RIGEL_EMBEDDING_CACHE_SIZE", "4096")),
+                persist_dir=os.environ.get("RIGEL_EMBEDDING_CACHE_DIR", "chromadb/embedding_cache") or None,
+            )
+        return _shared
@@ -0,0 +1,214 @@
+import asyncio
+import time
+from collections import deque
+from syslog import Syslog
+
+
+class LatencyTracker:
+    """Rolling window of call latencies and outcomes for one backend.
+
+    Calls that were cancelled before finishing (a lost hedge) only tell us the
+    latency was above what they reached, so they are kept apart as censored
+    samples and never enter the percentiles.
+    """
+
+    def __init__(self, window=100):
+        self._samples = deque(maxlen=window)
+        self._censored = deque(maxlen=window)
+        self.updated = 0.0
+
+    def record(self, seconds, ok=True):
+        self._samples.append((seconds, ok))
+        self.updated = time.monotonic()
+
+    def censor(self, seconds):
+        self._censored.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        latencies = sorted(seconds for seconds, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies) + 0.5)) - 1))
+        return latencies[index]
+
+    def error_rate(self):
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def snapshot(self):
+        return {"count": len(self), "p50": self.percentile(50), "p95": self.percentile(95),
+                "p99": self.percentile(99), "error_rate": self.error_rate(), "censored": len(self._censored)}
+
+
+class Backend:
+    def __init__(self, call, stream=None):
+        # call: async fn(input) -> answer, stream: async generator fn(input) -> tokens
+        self.call = call
+        self.stream = stream
+
+
+async def _first_token(stream):
+    return await stream.__anext__()
+
+
+class HedgedRouter:
+    """Sends each request to the backend that has been answering fastest.
+
+    Backends are tried in the given preference order until each has
+    min_samples results, after that they are ranked on error-adjusted p50.
+    Every explore_every-th request goes to the backend measured least
+    recently, so a backend that is never picked (or hedged) still gets
+    samples and adaptive ranking can start, and stale rankings get refreshed.
+    With hedging on, if the chosen backend has not answered (or, when
+    streaming, produced its first token) within its own p95, the next backend
+    is started too, the first answer wins and the other is cancelled. A failing
+    backend fails over to the next one straight away, but only when the
+    request is safe to run twice (failover, which follows hedge unless given),
+    otherwise its error goes back to the caller.
+    """
+
+    def __init__(self, backends, window=100, min_samples=5, hedge_percentile=95,
+                 min_hedge_delay=0.25, max_hedge_delay=5.0, explore_every=10, on_error=None):
+        self.syslog = Syslog(log_file="logs/hedged_router.log")
+        self.backends = dict(backends)
+        self.min_samples = min_samples
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.explore_every = explore_every
+        self.on_error = on_error
+        self._ranked = {"call": 0, "stream": 0}
+        # Whole answers and time to first token are tracked apart, they are on very different scales
+        self.trackers = {mode: {name: LatencyTracker(window) for name in self.backends} for mode in ("call", "stream")}
+        self.stats = {"requests": 0, "hedges": 0, "failovers": 0, "cancelled": 0, "explored": 0,
+                      "wins": {name: 0 for name in self.backends}}
+
+    def _expected_latency(self, tracker):
+        return tracker.percentile(50) / max(1.0 - tracker.error_rate(), 0.05) if tracker.percentile(50) is not None else float("inf")
+
+    def rank(self, available=None, mode="call"):
+        names = [name for name in self.backends if available is None or name in available]
+        trackers = self.trackers[mode]
+        if not any(len(trackers[name]) < self.min_samples for name in names):
+            names = sorted(names, key=lambda name: self._expected_latency(trackers[name]))
+        self._ranked[mode] += 1
+        if self.explore_every and len(names) > 1 and self._ranked[mode] % self.explore_every == 0:
+            # Fewest samples first, then the longest unmeasured
+            explore = min(names, key=lambda name: (min(len(trackers[name]), self.min_samples), trackers[name].updated))
+            names.remove(explore)
+            names.insert(0, explore)
+            self.stats["explored"] += 1
+        return names
+
+    def hedge_delay(self, name, mode="call"):
+        p = self.trackers[mode][name].percentile(self.hedge_percentile)
+        if p is None:
+            return self.max_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, p))
+
+    def _failed(self, name, mode, started, error):
+        self.trackers[mode][name].record(time.perf_counter() - started, ok=False)
+        self.syslog.log(f"Backend '{name}' failed ({mode}): {error}", level="WARNING")
+        if self.on_error is not None:
+            self.on_error(name, error)
+
+    async def _race(self, ranked, mode, start, hedge, failover):
+        """Runs start(name) for the ranked backends, hedging and failing over, and
+        returns (name, started, task) for the first one to complete successfully."""
+        queue = list(ranked)
+        pending = {}
+        last_error = None
+        hedged = False
+
+        def launch():
+            name = queue.pop(0)
+            pending[asyncio.create_task(start(name))] = (name, time.perf_counter())
+
+        launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay(ranked[0], mode) if hedge and queue and not hedged else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    self.syslog.log(f"Hedging '{ranked[0]}' with '{queue[0]}' after {timeout:.2f}s", level="INFO")
+                    launch()
+                    continue
+                for task in done:
+                    name, started = pending.pop(task)
+                    if task.exception() is None:
+                        return name, started, task
+                    last_error = task.exception()
+                    self._failed(name, mode, started, last_error)
+                # A failed backend may already have run a tool, only rerun what is safe to repeat
+                if not pending and queue and failover:
+                    self.stats["failovers"] += 1
+                    launch()
+            raise last_error
+        finally:
+            now = time.perf_counter()
+            for task, (name, started) in pending.items():
+                task.cancel()
+                # Only a lower bound on the loser's latency, kept out of its percentiles
+                self.trackers[mode][name].censor(now - started)
+                self.stats["cancelled"] += 1
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def call(self, input, available=None, hedge=True, failover=None):
+        ranked = self.rank(available, "call")
+        if not ranked:
+            raise RuntimeError("No backend available")
+        self.stats["requests"] += 1
+        name, started, task = await self._race(ranked, "call", lambda name: self.backends[name].call(input), hedge,
+                                            hedge if failover is None else failover)
+        self.trackers["call"][name].record(time.perf_counter() - started, ok=True)
+        self.stats["wins"][name] += 1
+        return task.result()
+
+    async def stream(self, input, available=None, hedge=True, failover=None):
+        ranked = [name for name in self.rank(available, "stream") if self.backends[name].stream is not None]
+        if not ranked:
+            raise RuntimeError("No streaming backend available")
+        self.stats["requests"] += 1
+        streams = {}
+
+        async def start(name):
+            # The race is on the first token, the winner's stream is then read to the end
+            streams[name] = self.backends[name].stream(input)
+            try:
+                return await _first_token(streams[name])
+            except StopAsyncIteration:
+                return None
+
+        try:
+            name, started, task = await self._race(ranked, "stream", start, hedge,
+                                                   hedge if failover is None else failover)
+        except BaseException:
+            for stream in streams.values():
+                await stream.aclose()
+            raise
+        for loser, stream in streams.items():
+            if loser != name:
+                await stream.aclose()
+        self.trackers["stream"][name].record(time.perf_counter() - started, ok=True)
+        self.stats["wins"][name] += 1
+
+        stream = streams[name]
+        try:
+            first = task.result()
+            if first is None:
+                return
+            yield first
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+
+    def snapshot(self):
+        return {mode: {name: tracker.snapshot() for name, tracker in trackers.items()}
+                for mode, trackers in self.trackers.items()}
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+
+
+class IdAllocator:
+    """Monotonic per-collection id counters persisted next to the Chroma store.
+
+    Replaces len(collection.get()['ids']) + 1, which pulled the whole collection
+    on every write and handed out duplicate ids once anything was deleted.
+    """
+
+    def __init__(self, state_path="chromadb/id_counters.json"):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._counters = self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return {name: int(value) for name, value in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._counters, f)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _seed(collection, prefix):
+        # One-off scan for collections that predate the allocator, ids only
+        ids = collection.get(include=[])['ids']
+        highest = 0
+        for existing in ids:
+            if existing.startswith(f"{prefix}_"):
+                suffix = existing[len(prefix) + 1:]
+                if suffix.isdigit():
+                    highest = max(highest, int(suffix))
+        return max(highest, len(ids))
+
+    def next_ids(self, collection, prefix, count=1):
+        key = f"{collection.name}:{prefix}"
+        with self._lock:
+            if key not in self._counters:
+                self._counters[key] = self._seed(collection, prefix)
+            start = self._counters[key] + 1
+            self._counters[key] += count
+            self._save()
+        return [f"{prefix}_{n}" for n in range(start, start + count)]
+
+    def next_id(self, collection, prefix):
+        return self.next_ids(collection, prefix)[0]
@@ -0,0 +1,277 @@
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from syslog import Syslog
+from chunker import chunk_text
+
+
+PDF_EXTENSIONS = {".pdf"}
+TEXT_EXTENSIONS = {".md", ".markdown", ".txt"}
+# man1 .. man9 sources, optionally gzipped like the ones under /usr/share/man
+_MAN_RE = re.compile(r"\.[1-9][a-z]*(\.gz)?$")
+_ROFF_FONT_RE = re.compile(r"\\f[BIRP]|\\f\(..|\\s[+-]?\d+")
+
+
+def document_kind(path):
+    lowered = path.lower()
+    extension = os.path.splitext(lowered)[1]
+    if extension in PDF_EXTENSIONS:
+        return "pdf"
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+    if _MAN_RE.search(lowered):
+        return "man"
+    return None
+
+
+def _hash_text(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _roff_to_text(source):
+    # Good enough for retrieval: keep the prose and section names, drop the formatting requests
+    lines = []
+    for line in source.splitlines():
+        if line.startswith(('.\\"', "'\\\"")):
+            continue
+        if line.startswith((".SH", ".SS")):
+            lines.append("")
+            lines.append(line[3:].strip().strip('"'))
+            continue
+        if line.startswith((".B ", ".I ", ".BR ", ".IR ", ".BI ", ".RB ", ".IB ", ".RI ")):
+            lines.append(line.split(" ", 1)[1].replace('"', ""))
+            continue
+        if line.startswith((".", "'")):
+            continue
+        lines.append(_ROFF_FONT_RE.sub("", line).replace("\\-", "-").replace("\\(em", "-").replace("\\e", "\\"))
+    return "\n".join(lines).strip()
+
+
+def extract_pages(path, kind, start=0, stop=None):
+    """Returns [(page_number, text)] for one document, or a page range of a PDF.
+
+    Runs in the worker processes, so it only takes and returns plain data.
+    """
+    if kind == "pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        return [(number, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    if kind == "man":
+        text = _roff_to_text(text)
+    return [(0, text)]
+
+
+def _pdf_page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+class SyscomIngestor:
+    """Keeps a Chroma collection in step with a set of command-guide documents.
+
+    Sources can be single files or directories of PDF, markdown and man pages.
+    A manifest of file and page hashes is kept next to the store: unchanged
+    files are skipped on a stat check, changed ones are re-extracted in a
+    process pool and only the pages whose text actually moved are re-chunked
+    and re-embedded, in batches. Chunks of removed pages and files are deleted.
+    """
+
+    def __init__(self, collection, sources, manifest_path, workers=None, batch_size=64, pages_per_task=16,
+                 chunk_chars=800, chunk_overlap=120):
+        self.syslog = Syslog(log_file="logs/ingest.log")
+        self.collection = collection
+        self.sources = [sources] if isinstance(sources, str) else list(sources)
+        self.manifest_path = manifest_path
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.pages_per_task = pages_per_task
+        self.chunker = {"max_chars": chunk_chars, "overlap": chunk_overlap}
+        self.manifest = None
+        self.stats = {}
+
+    def discover(self):
+        found = []
+        for source in self.sources:
+            if os.path.isfile(source):
+                if document_kind(source):
+                    found.append(source)
+            elif os.path.isdir(source):
+                for root, _, files in os.walk(source):
+                    for name in sorted(files):
+                        if document_kind(name):
+                            found.append(os.path.join(root, name))
+        return sorted(set(os.path.normpath(path) for path in found))
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, manifest):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def page_id(path, number):
+        return f"{path}#p{number}"
+
+    @staticmethod
+    def chunk_ids(page_id, count):
+        return [f"{page_id}c{index}" for index in range(count)]
+
+    def _page_chunk_ids(self, entry, page_ids):
+        return [chunk_id for page_id in page_ids for chunk_id in self.chunk_ids(page_id, entry.get("chunks", {}).get(page_id, 0))]
+
+    def neighbour_ids(self, source, page, chunk, window=1):
+        # Chunk ids within window positions of a chunk, following on across page boundaries
+        entry = (self.manifest or {}).get("files", {}).get(source)
+        if not entry:
+            return []
+        ordered = [chunk_id for page_id in entry["pages"] for chunk_id in self.chunk_ids(page_id, entry["chunks"].get(page_id, 0))]
+        try:
+            position = ordered.index(f"{self.page_id(source, page)}c{chunk}")
+        except ValueError:
+            return []
+        return ordered[max(0, position - window):position] + ordered[position + 1:position + 1 + window]
+
+    @staticmethod
+    def digest(manifest):
+        # Changes whenever any page of the corpus (or the way it is chunked) does, the lexical index is keyed on it
+        digest = hashlib.sha1(json.dumps(manifest.get("chunker"), sort_keys=True).encode("utf-8"))
+        for path in sorted(manifest.get("files", {})):
+            for page_id, page_hash in sorted(manifest["files"][path]["pages"].items()):
+                digest.update(f"{page_id}\0{page_hash}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _tasks(self, path, kind):
+        if kind != "pdf":
+            return [(path, kind, 0, None)]
+        count = _pdf_page_count(path)
+        return [(path, kind, start, start + self.pages_per_task) for start in range(0, count, self.pages_per_task)]
+
+    def _extract(self, changed):
+        tasks = [task for path, kind in changed for task in self._tasks(path, kind)]
+        pages = {path: {} for path, _ in changed}
+        if len(tasks) == 1 or self.workers == 1:
+            results = [extract_pages(*task) for task in tasks]
+        else:
+            # Spawned, not forked, the parent has syslog, writer and scheduler threads that may hold locks
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = list(pool.map(extract_pages, *zip(*tasks)))
+        for (path, _, _, _), extracted in zip(tasks, results):
+            pages[path].update(extracted)
+        return pages
+
+    def _flush(self, ids, documents, metadatas):
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            self.collection.upsert(ids=ids[start:end], documents=documents[start:end], metadatas=metadatas[start:end])
+
+    def sync(self):
+        manifest = self._load_manifest()
+        # A new chunking setup means every page has to be cut again
+        first_run = manifest is None or manifest.get("chunker") != self.chunker
+        if first_run:
+            manifest = {"chunker": self.chunker, "files": {}}
+        files = manifest["files"]
+        paths = self.discover()
+        self.stats = {"files": len(paths), "unchanged_files": 0, "changed_files": 0, "removed_files": 0,
+                      "pages_skipped": 0, "chunks_upserted": 0, "chunks_deleted": 0}
+
+        changed = []
+        hashes = {}
+        touched = False
+        for path in paths:
+            stat = os.stat(path)
+            entry = files.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                self.stats["unchanged_files"] += 1
+                continue
+            file_hash = _hash_file(path)
+            if entry and entry["sha1"] == file_hash:
+                # Touched but identical, just remember the new stat
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                touched = True
+                self.stats["unchanged_files"] += 1
+                continue
+            hashes[path] = (file_hash, stat)
+            changed.append((path, document_kind(path)))
+
+        stale_ids = []
+        for path in [path for path in files if path not in paths]:
+            entry = files.pop(path)
+            stale_ids.extend(self._page_chunk_ids(entry, entry["pages"]))
+            self.stats["removed_files"] += 1
+
+        ids, documents, metadatas = [], [], []
+        if changed:
+            self.syslog.log(f"Extracting {len(changed)} changed document(s) with {self.workers} worker(s)", level="INFO")
+            for path, pages in self._extract(changed).items():
+                file_hash, stat = hashes[path]
+                entry = files.get(path, {"pages": {}, "chunks": {}})
+                current, chunk_counts = {}, {}
+                for number, text in sorted(pages.items()):
+                    if not text.strip():
+                        continue
+                    page_id = self.page_id(path, number)
+                    page_hash = _hash_text(text)
+                    current[page_id] = page_hash
+                    if entry["pages"].get(page_id) == page_hash:
+                        chunk_counts[page_id] = entry["chunks"].get(page_id, 0)
+                        self.stats["pages_skipped"] += 1
+                        continue
+                    chunks = chunk_text(text, self.chunker["max_chars"], self.chunker["overlap"])
+                    chunk_counts[page_id] = len(chunks)
+                    for index, (start, end, chunk) in enumerate(chunks):
+                        ids.append(f"{page_id}c{index}")
+                        documents.append(chunk)
+                        metadatas.append({"source": path, "page": number, "chunk": index, "start": start, "end": end,
+                                          "kind": document_kind(path)})
+                new_ids = {chunk_id for page_id, count in chunk_counts.items() for chunk_id in self.chunk_ids(page_id, count)}
+                stale_ids.extend(chunk_id for chunk_id in self._page_chunk_ids(entry, entry["pages"]) if chunk_id not in new_ids)
+                files[path] = {"sha1": file_hash, "size": stat.st_size, "mtime": stat.st_mtime, "pages": current, "chunks": chunk_counts}
+                self.stats["changed_files"] += 1
+
+        if first_run:
+            # Anything already in the collection that the manifest does not account for
+            # (e.g. whole pages stored by an older layout) is dropped
+            known = {chunk_id for entry in files.values() for chunk_id in self._page_chunk_ids(entry, entry["pages"])}
+            stale_ids.extend(item_id for item_id in self.collection.get(include=[])["ids"] if item_id not in known)
+
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+            self.stats["chunks_deleted"] = len(stale_ids)
+        if ids:
+            self._flush(ids, documents, metadatas)
+            self.stats["chunks_upserted"] = len(ids)
+
+        manifest["digest"] = self.digest(manifest)
+        self.manifest = manifest
+        if changed or stale_ids or touched or first_run:
+            self._save_manifest(manifest)
+        self.syslog.log(f"Syscom ingestion: {self.stats}", level="INFO")
+        return manifest["digest"]
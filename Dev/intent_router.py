@@ -0,0 +1,146 @@
+import json
+import os
+import numpy as np
+from embedding_cache import get_shared_embedding_function
+from syslog import Syslog
+from tracing import traced
+
+
+CONVERSATIONAL = "conversational"
+TOOL = "tool"
+SYSCOM = "syscom"
+
+# Seed utterances for each route. Extend them with data/intent_examples.json
+# instead of editing this list, the file is merged on top of these at startup.
+DEFAULT_EXAMPLES = {
+    CONVERSATIONAL: [
+        "Who are you ?",
+        "What is Rigel ?",
+        "Tell me about yourself",
+        "How are you doing today ?",
+        "Hello Rigel",
+        "Good morning",
+        "Thank you",
+        "What can you do ?",
+        "Explain how a neural network works",
+        "What is the capital of France ?",
+        "Tell me a joke",
+        "What did I ask you earlier ?",
+        "Summarize what we talked about",
+        "Why is the sky blue ?",
+    ],
+    TOOL: [
+        "What is the time right now ?",
+        "What is the current date ?",
+        "Open the file notes.txt",
+        "Read main.py and show me line 20",
+        "Show me the contents of config.json",
+        "Count the words in this sentence",
+        "How many words are in this text ?",
+        "Create a new tool that reverses a string",
+        "Generate a tool that adds two numbers",
+    ],
+    SYSCOM: [
+        "List the files in this directory",
+        "Run ls -la",
+        "Create a folder called projects",
+        "Delete the temp directory",
+        "Install htop",
+        "Update the system packages",
+        "Restart the network service",
+        "Check the disk usage",
+        "How much memory is free ?",
+        "Show running processes",
+        "Change the permissions of script.sh to executable",
+        "Kill the process using port 8080",
+        "What is my IP address ?",
+        "Execute uname -a",
+    ],
+}
+
+
+class IntentRouter:
+    def __init__(self, embedding_function=None, examples_path="data/intent_examples.json",
+                 margin=0.05, min_similarity=0.35):
+        self.syslog = Syslog(log_file="logs/intent_router.log")
+        self.embedding_function = embedding_function or get_shared_embedding_function()
+        self.examples_path = examples_path
+        self.margin = margin
+        self.min_similarity = min_similarity
+        self.labels = []
+        self._example_matrix = None
+        self._label_starts = None
+        self.load_examples()
+
+    def _read_examples_file(self):
+        # Accepts either {"tool": [...], ...} or one {"label": ..., "text": ...} object per line
+        if not self.examples_path or not os.path.exists(self.examples_path):
+            return {}
+        extra = {}
+        with open(self.examples_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if not content:
+            return {}
+        try:
+            data = json.loads(content)
+            if isinstance(data, dict):
+                for label, texts in data.items():
+                    extra.setdefault(label, []).extend(texts)
+                return extra
+        except json.JSONDecodeError:
+            pass
+        for line in content.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                extra.setdefault(record["label"], []).append(record["text"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                self.syslog.log(f"Skipping malformed intent example: {line}", level="WARNING")
+        return extra
+
+    def load_examples(self):
+        examples = {label: list(texts) for label, texts in DEFAULT_EXAMPLES.items()}
+        for label, texts in self._read_examples_file().items():
+            examples.setdefault(label, []).extend(texts)
+
+        # Keep each label's rows contiguous so the per-label max is a single reduceat
+        self.labels = [label for label in examples if examples[label]]
+        texts = []
+        starts = []
+        for label in self.labels:
+            starts.append(len(texts))
+            texts.extend(examples[label])
+
+        self._example_matrix = self._normalize(np.asarray(self.embedding_function(texts), dtype=np.float32))
+        self._label_starts = np.asarray(starts)
+        self.syslog.log(f"IntentRouter loaded {len(texts)} examples across {len(self.labels)} routes", level="INFO")
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def scores(self, text):
+        query = self._normalize(np.asarray(self.embedding_function([text]), dtype=np.float32))[0]
+        similarities = self._example_matrix @ query
+        label_scores = np.maximum.reduceat(similarities, self._label_starts)
+        return dict(zip(self.labels, label_scores.tolist()))
+
+    @traced()
+    def route(self, text, fallback=None):
+        """Returns (label, confident). Calls fallback(text) when the margin is too thin to trust."""
+        label_scores = self.scores(text)
+        ranked = sorted(label_scores.items(), key=lambda item: item[1], reverse=True)
+        best_label, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        confident = best_score >= self.min_similarity and (best_score - runner_up) >= self.margin
+        self.syslog.log(f"Route scores for '{text}': {label_scores} -> {best_label} (confident={confident})", level="INFO")
+
+        if confident or fallback is None:
+            return best_label, confident
+
+        self.syslog.log("Route is ambiguous, falling back to LLM classification", level="WARNING")
+        return fallback(text), False
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import math
+import os
+import re
+
+
+# Flags keep their case (-r and -R are different things), words are lowercased
+_FLAG_RE = re.compile(r"(?<![\w-])--?[A-Za-z][\w-]*")
+_WORD_RE = re.compile(r"[A-Za-z0-9_][\w./+:-]*[\w]|[A-Za-z0-9_]")
+
+
+def tokenize(text):
+    tokens = _FLAG_RE.findall(text)
+    for word in _WORD_RE.findall(_FLAG_RE.sub(" ", text)):
+        word = word.lower()
+        tokens.append(word)
+        # Also index the parts of compound tokens so "systemctl" matches "/usr/bin/systemctl"
+        if any(sep in word for sep in "./:-"):
+            tokens.extend(part for part in re.split(r"[./:-]+", word) if part)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, persisted as JSON next to the Chroma store."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.documents = {}
+        self.postings = {}
+        self.doc_lengths = []
+        self.idf = {}
+        self.avg_length = 0.0
+        self.fingerprint = None
+
+    @staticmethod
+    def corpus_fingerprint(ids, documents):
+        digest = hashlib.sha1()
+        for item_id, document in sorted(zip(ids, documents)):
+            digest.update(item_id.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update((document or "").encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def build(self, ids, documents, fingerprint=None):
+        self.ids = list(ids)
+        self.documents = dict(zip(self.ids, documents))
+        self.postings = {}
+        self.doc_lengths = []
+        for index, document in enumerate(documents):
+            tokens = tokenize(document or "")
+            self.doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append([index, tf])
+        total = len(self.ids)
+        self.avg_length = sum(self.doc_lengths) / total if total else 0.0
+        self.idf = {token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for token, docs in self.postings.items()}
+        self.fingerprint = fingerprint or self.corpus_fingerprint(self.ids, documents)
+        return self
+
+    def search(self, query, n_results=10):
+        if not self.ids:
+            return []
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf[token]
+            for index, tf in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[index] / (self.avg_length or 1)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        best = sorted(scores, key=scores.get, reverse=True)[:n_results]
+        return [(self.ids[index], scores[index]) for index in best]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "fingerprint": self.fingerprint, "k1": self.k1, "b": self.b, "ids": self.ids,
+                "documents": self.documents, "postings": self.postings, "doc_lengths": self.doc_lengths,
+                "idf": self.idf, "avg_length": self.avg_length,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.idf = data["idf"]
+        index.avg_length = data["avg_length"]
+        index.fingerprint = data["fingerprint"]
+        return index
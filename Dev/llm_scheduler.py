@@ -0,0 +1,280 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from syslog import Syslog
+from tracing import span
+
+
+# Lower runs first
+INTERACTIVE = 0
+ROUTING = 1
+# Work that may be thrown away (a branch started before the route is known) never delays the route itself
+SPECULATIVE = 2
+BACKGROUND = 3
+PRIORITY_NAMES = {INTERACTIVE: "interactive", ROUTING: "routing", SPECULATIVE: "speculative", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 a second up to its capacity. Usage reconciled after
+    the fact may push it below zero, later requests then wait the debt off."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        # Anything bigger than the bucket goes once it is full, or it would never go
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def adjust(self, delta):
+        self.level = min(self.capacity, self.level - delta)
+
+
+class _Waiter:
+    def __init__(self, backend, priority, tokens, grant):
+        self.backend = backend
+        self.priority = priority
+        self.tokens = tokens
+        self.grant = grant
+        self.granted = False
+        self.cancelled = False
+        self.enqueued = time.monotonic()
+
+
+class Ticket:
+    """A granted slot. used(tokens) settles the token estimate against what the backend reported."""
+
+    def __init__(self, scheduler, waiter):
+        self._scheduler = scheduler
+        self._waiter = waiter
+        self.queue_time = time.monotonic() - waiter.enqueued
+
+    def used(self, tokens):
+        if tokens:
+            self._scheduler._settle(self._waiter, tokens)
+
+
+class _Backend:
+    def __init__(self, name, max_concurrency, rpm=0, tpm=0, reserved=1):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        # Slots speculative and background work may not take, so a turn never waits behind either
+        self.reserved = min(reserved, self.max_concurrency - 1)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.queue = []
+        self.stats = {"granted": 0, "cancelled": 0, "rate_limited": 0, "paused": 0,
+                      "queue_seconds": {name: 0.0 for name in PRIORITY_NAMES.values()},
+                      "max_queue_seconds": {name: 0.0 for name in PRIORITY_NAMES.values()}}
+
+    def limit_for(self, priority):
+        return self.max_concurrency - (self.reserved if priority >= SPECULATIVE else 0)
+
+
+class LLMScheduler:
+    """Hands out LLM call slots per backend, highest priority first.
+
+    Each backend has a concurrency cap and optional requests- and
+    tokens-per-minute buckets. Waiting requests queue by priority, then
+    arrival. Callers take a slot with slot() from threads or aslot() from
+    coroutines and hold it for the length of the call (or stream). A backend
+    that answers with a rate-limit error can be paused for its retry-after.
+    Time spent queueing is traced as llm_queue:<backend>:<priority>.
+    """
+
+    def __init__(self):
+        self.syslog = Syslog(log_file="logs/llm_scheduler.log")
+        self.backends = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        scheduler = cls()
+        scheduler.configure("ollama", int(os.environ.get("RIGEL_OLLAMA_CONCURRENCY", "2")),
+                            rpm=int(os.environ.get("RIGEL_OLLAMA_RPM", "0")),
+                            tpm=int(os.environ.get("RIGEL_OLLAMA_TPM", "0")))
+        # Defaults are Groq's free tier limits for the 70b model
+        scheduler.configure("groq", int(os.environ.get("RIGEL_GROQ_CONCURRENCY", "4")),
+                            rpm=int(os.environ.get("RIGEL_GROQ_RPM", "30")),
+                            tpm=int(os.environ.get("RIGEL_GROQ_TPM", "6000")))
+        return scheduler
+
+    def configure(self, name, max_concurrency, rpm=0, tpm=0, reserved=1):
+        with self._cond:
+            self.backends[name] = _Backend(name, max_concurrency, rpm, tpm, reserved)
+
+    # Dispatch, always under the lock
+
+    def _dispatch(self, backend):
+        """Grants what can go now, returns seconds until the head might go, or None to wait for a release."""
+        now = time.monotonic()
+        while backend.queue:
+            _, _, waiter = backend.queue[0]
+            if waiter.cancelled:
+                heapq.heappop(backend.queue)
+                continue
+            if now < backend.paused_until:
+                return backend.paused_until - now
+            # Strict order: if the head can't go, nothing behind it (same or lower priority) can either
+            if backend.in_flight >= backend.limit_for(waiter.priority):
+                return None
+            wait = max(backend.requests.wait_time(1, now) if backend.requests else 0.0,
+                       backend.tokens.wait_time(waiter.tokens, now) if backend.tokens else 0.0)
+            if wait > 0:
+                backend.stats["rate_limited"] += 1
+                return wait
+            if backend.requests:
+                backend.requests.take(1, now)
+            if backend.tokens:
+                backend.tokens.take(waiter.tokens, now)
+            heapq.heappop(backend.queue)
+            backend.in_flight += 1
+            backend.stats["granted"] += 1
+            waited = now - waiter.enqueued
+            priority = PRIORITY_NAMES[waiter.priority]
+            backend.stats["queue_seconds"][priority] += waited
+            backend.stats["max_queue_seconds"][priority] = max(backend.stats["max_queue_seconds"][priority], waited)
+            waiter.granted = True
+            waiter.grant()
+        return None
+
+    def _dispatch_all(self):
+        waits = [wait for wait in (self._dispatch(backend) for backend in self.backends.values()) if wait is not None]
+        return min(waits) if waits else None
+
+    def _run(self):
+        # Only needed for timed wake-ups (refills, pauses), releases dispatch inline
+        with self._cond:
+            while True:
+                self._cond.wait(timeout=self._dispatch_all())
+
+    def _enqueue(self, name, priority, tokens, grant):
+        backend = self.backends.get(name)
+        if backend is None:
+            raise KeyError(f"No LLM backend configured under '{name}'")
+        waiter = _Waiter(name, priority, tokens, grant)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+                self._thread.start()
+            heapq.heappush(backend.queue, (priority, next(self._seq), waiter))
+            self._dispatch(backend)
+            self._cond.notify()
+        return waiter
+
+    def _abandon(self, waiter):
+        # A waiter given up on: dropped if still queued, its slot handed back if it got one meanwhile
+        with self._cond:
+            if waiter.granted:
+                self._release_locked(waiter)
+            else:
+                waiter.cancelled = True
+                self.backends[waiter.backend].stats["cancelled"] += 1
+
+    def _release_locked(self, waiter):
+        backend = self.backends[waiter.backend]
+        backend.in_flight -= 1
+        self._dispatch(backend)
+        self._cond.notify()
+
+    def _release(self, waiter):
+        with self._cond:
+            self._release_locked(waiter)
+
+    def _settle(self, waiter, tokens):
+        with self._cond:
+            backend = self.backends[waiter.backend]
+            if backend.tokens:
+                backend.tokens.adjust(tokens - waiter.tokens)
+                waiter.tokens = tokens
+                # Overestimates hand tokens back, the head may be able to go now
+                self._dispatch(backend)
+                self._cond.notify()
+
+    # Public API
+
+    @contextmanager
+    def slot(self, backend, priority=INTERACTIVE, tokens=0):
+        granted = threading.Event()
+        with span(f"llm_queue:{backend}:{PRIORITY_NAMES[priority]}"):
+            waiter = self._enqueue(backend, priority, tokens, granted.set)
+            try:
+                granted.wait()
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        try:
+            yield Ticket(self, waiter)
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def aslot(self, backend, priority=INTERACTIVE, tokens=0):
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def grant():
+            # Called under the scheduler lock, possibly from another thread
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        with span(f"llm_queue:{backend}:{PRIORITY_NAMES[priority]}"):
+            waiter = self._enqueue(backend, priority, tokens, grant)
+            try:
+                await granted
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        try:
+            yield Ticket(self, waiter)
+        finally:
+            self._release(waiter)
+
+    def pause(self, backend, seconds):
+        with self._cond:
+            state = self.backends[backend]
+            state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+            state.stats["paused"] += 1
+            self._cond.notify()
+        self.syslog.log(f"Backend '{backend}' rate limited, holding its queue for {seconds:.1f}s", level="WARNING")
+
+    @staticmethod
+    def retry_after(error, default=5.0):
+        """Seconds to back off if error is a rate-limit (HTTP 429) response, else None."""
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        if status != 429:
+            return None
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers.get("retry-after", default))
+        except (TypeError, ValueError):
+            return default
+
+    def snapshot(self):
+        with self._cond:
+            return {name: {"in_flight": backend.in_flight, "max_concurrency": backend.max_concurrency,
+                           "queued": sum(1 for _, _, waiter in backend.queue if not waiter.cancelled),
+                           "paused_for": max(0.0, backend.paused_until - time.monotonic()),
+                           "requests_available": backend.requests.level if backend.requests else None,
+                           "tokens_available": backend.tokens.level if backend.tokens else None,
+                           **backend.stats}
+                    for name, backend in self.backends.items()}
@@ -0,0 +1,290 @@
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from syslog import Syslog
+
+
+class TieredMemory:
+    """Long-term QA memory split into a hot shard and monthly archive shards.
+
+    New answers land in the hot shard (the original rigel_memory collection).
+    A background consolidation pass merges near-duplicates, moves entries older
+    than hot_days into rigel_memory_archive_YYYYMM shards and evicts by age and
+    hit count once the total goes over max_entries. Queries only fan out to the
+    archives, newest first, when the hot shard has nothing close enough.
+    """
+
+    def __init__(self, chroma_client, hot_collection_name="rigel_memory", embedding_function=None,
+                 id_allocator=None, writer=None, hot_days=7, hot_max_entries=2000, max_entries=20000,
+                 max_age_days=365, keep_hits=3, duplicate_distance=0.1, fanout_distance=1.0,
+                 max_fanout_shards=6, consolidate_interval=600.0):
+        self.syslog = Syslog(log_file="logs/long_term_memory.log")
+        self.chroma_client = chroma_client
+        self.embedding_function = embedding_function
+        self.id_allocator = id_allocator
+        self.writer = writer
+        self.hot_collection_name = hot_collection_name
+        self.archive_prefix = f"{hot_collection_name}_archive_"
+        self.hot_days = hot_days
+        self.hot_max_entries = hot_max_entries
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.keep_hits = keep_hits
+        # Chroma's default space is squared L2, on unit vectors that is 2 - 2cos
+        self.duplicate_distance = duplicate_distance
+        self.fanout_distance = fanout_distance
+        self.max_fanout_shards = max_fanout_shards
+        self.hot = self._collection(hot_collection_name)
+        # Shards come and go on the consolidation thread, readers work on a snapshot taken under the lock
+        self._archives = {}
+        self._archives_lock = threading.Lock()
+        for name in self._list_collection_names():
+            if name.startswith(self.archive_prefix):
+                self._archives[name] = self._collection(name)
+        self._pending_hits = {}
+        self._hits_lock = threading.Lock()
+        self._consolidate_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if consolidate_interval:
+            self._thread = threading.Thread(target=self._consolidate_loop, args=(consolidate_interval,),
+                                            name="memory-consolidation", daemon=True)
+            self._thread.start()
+
+    def _collection(self, name):
+        return self.chroma_client.get_or_create_collection(name=name, embedding_function=self.embedding_function)
+
+    def _list_collection_names(self):
+        # Older chroma returns Collection objects, newer ones plain names
+        return [getattr(c, "name", c) for c in self.chroma_client.list_collections()]
+
+    def _archive_shards(self, newest_first=False):
+        with self._archives_lock:
+            return sorted(self._archives.items(), reverse=newest_first)
+
+    def _archive(self, name):
+        with self._archives_lock:
+            return self._archives.get(name)
+
+    def add(self, question, answer):
+        item_id = self.id_allocator.next_id(self.hot, "qa")
+        metadata = {"question": question, "answer": answer, "created_at": time.time(), "hits": 0}
+        if self.writer is not None:
+            self.writer.submit(self.hot, answer, metadata, item_id)
+        else:
+            self.hot.add(documents=[answer], metadatas=[metadata], ids=[item_id])
+
+    def _query_collection(self, collection, question, n_results):
+        count = collection.count()
+        if count == 0:
+            return []
+        results = collection.query(
+            query_texts=[question],
+            n_results=min(n_results, count),
+            include=["documents", "metadatas", "distances"]
+        )
+        if not results["documents"] or not results["metadatas"]:
+            return []
+        return [(distance, collection.name, item_id, doc, metadata or {})
+                for item_id, doc, metadata, distance in zip(results["ids"][0], results["documents"][0],
+                                                             results["metadatas"][0], results["distances"][0])]
+
+    def query(self, question, n_results=3, max_distance=3):
+        matches = self._query_collection(self.hot, question, n_results)
+        close_enough = sum(1 for match in matches if match[0] <= self.fanout_distance)
+        for name, shard in self._archive_shards(newest_first=True)[:self.max_fanout_shards]:
+            if close_enough >= n_results:
+                break
+            try:
+                shard_matches = self._query_collection(shard, question, n_results)
+            except Exception as e:
+                # Only empty shards are deleted, one that vanished since the snapshot has nothing to give
+                self.syslog.log(f"Skipping archive shard {name}: {e}", level="WARNING")
+                continue
+            matches.extend(shard_matches)
+            close_enough += sum(1 for match in shard_matches if match[0] <= self.fanout_distance)
+
+        matches = sorted((m for m in matches if m[0] <= max_distance), key=lambda m: m[0])[:n_results]
+        with self._hits_lock:
+            for _, collection_name, item_id, _, _ in matches:
+                key = (collection_name, item_id)
+                self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        return [(doc, metadata, distance) for distance, _, _, doc, metadata in matches]
+
+    def count(self):
+        return self.hot.count() + sum(collection.count() for _, collection in self._archive_shards())
+
+    # Consolidation, runs on the background thread (or on demand)
+
+    def _consolidate_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.consolidate()
+            except Exception as e:
+                self.syslog.log(f"Memory consolidation failed: {e}", level="ERROR")
+
+    def consolidate(self):
+        with self._consolidate_lock:
+            started = time.monotonic()
+            self._flush_hits()
+            merged = self._dedupe(self.hot)
+            archived = self._roll_over()
+            evicted = self._evict()
+            self.syslog.log(f"Memory consolidation: merged={merged} archived={archived} evicted={evicted} "
+                            f"total={self.count()} in {time.monotonic() - started:.2f}s", level="INFO")
+
+    def _flush_hits(self):
+        with self._hits_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        by_collection = {}
+        for (collection_name, item_id), hits in pending.items():
+            by_collection.setdefault(collection_name, {})[item_id] = hits
+        for collection_name, hits_by_id in by_collection.items():
+            collection = self.hot if collection_name == self.hot.name else self._archive(collection_name)
+            if collection is None:
+                continue
+            found = collection.get(ids=list(hits_by_id), include=["metadatas"])
+            if not found["ids"]:
+                continue
+            metadatas = []
+            for item_id, metadata in zip(found["ids"], found["metadatas"]):
+                metadata = dict(metadata or {})
+                metadata["hits"] = int(metadata.get("hits", 0)) + hits_by_id[item_id]
+                metadatas.append(metadata)
+            collection.update(ids=found["ids"], metadatas=metadatas)
+
+    @staticmethod
+    def _entries(collection, where=None):
+        found = collection.get(where=where, include=["documents", "metadatas", "embeddings"])
+        entries = []
+        for item_id, doc, metadata, embedding in zip(found["ids"], found["documents"], found["metadatas"], found["embeddings"]):
+            entries.append({"id": item_id, "document": doc, "metadata": dict(metadata or {}),
+                            "embedding": np.asarray(embedding, dtype=np.float32)})
+        return entries
+
+    def _dedupe(self, collection):
+        entries = self._entries(collection)
+        # Rows written before created_at existed get stamped now and age from here
+        legacy = [entry for entry in entries if "created_at" not in entry["metadata"]]
+        if legacy:
+            now = time.time()
+            for entry in legacy:
+                entry["metadata"].setdefault("created_at", now)
+                entry["metadata"].setdefault("hits", 0)
+            collection.update(ids=[e["id"] for e in legacy], metadatas=[e["metadata"] for e in legacy])
+        if len(entries) < 2:
+            return 0
+
+        entries.sort(key=lambda entry: entry["metadata"]["created_at"], reverse=True)
+        matrix = np.stack([entry["embedding"] for entry in entries])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        similarity_floor = 1.0 - self.duplicate_distance / 2.0
+
+        # Greedy newest-first: an entry is folded into the newest kept entry it duplicates
+        kept = []
+        absorbed = {}
+        for index in range(len(entries)):
+            if kept:
+                similarities = matrix[kept] @ matrix[index]
+                best = int(np.argmax(similarities))
+                if similarities[best] >= similarity_floor:
+                    absorbed.setdefault(kept[best], []).append(index)
+                    continue
+            kept.append(index)
+
+        if not absorbed:
+            return 0
+        update_ids, update_metadatas, delete_ids = [], [], []
+        for keeper, duplicates in absorbed.items():
+            metadata = entries[keeper]["metadata"]
+            metadata["hits"] = int(metadata.get("hits", 0)) + sum(int(entries[d]["metadata"].get("hits", 0)) + 1 for d in duplicates)
+            metadata["merged"] = int(metadata.get("merged", 0)) + len(duplicates)
+            update_ids.append(entries[keeper]["id"])
+            update_metadatas.append(metadata)
+            delete_ids.extend(entries[d]["id"] for d in duplicates)
+        collection.update(ids=update_ids, metadatas=update_metadatas)
+        collection.delete(ids=delete_ids)
+        return len(delete_ids)
+
+    def _roll_over(self):
+        # Old entries move out by age, and the oldest go early if the hot shard is over its cap
+        entries = self._entries(self.hot)
+        entries.sort(key=lambda entry: entry["metadata"].get("created_at", 0))
+        cutoff = time.time() - self.hot_days * 86400
+        overflow = max(0, len(entries) - self.hot_max_entries)
+        moving = [entry for i, entry in enumerate(entries)
+                  if i < overflow or entry["metadata"].get("created_at", 0) < cutoff]
+        if not moving:
+            return 0
+
+        by_shard = {}
+        for entry in moving:
+            month = datetime.fromtimestamp(entry["metadata"].get("created_at", 0)).strftime("%Y%m")
+            by_shard.setdefault(f"{self.archive_prefix}{month}", []).append(entry)
+
+        moved = 0
+        for shard_name, shard_entries in by_shard.items():
+            shard = self._archive(shard_name)
+            if shard is None:
+                shard = self._collection(shard_name)
+                with self._archives_lock:
+                    self._archives[shard_name] = shard
+            fresh = []
+            for entry in shard_entries:
+                # Already archived under another id, just carry the hits over
+                duplicate = shard.query(query_embeddings=[entry["embedding"].tolist()], n_results=1,
+                                        include=["metadatas", "distances"]) if shard.count() else None
+                if duplicate and duplicate["ids"][0] and duplicate["distances"][0][0] <= self.duplicate_distance:
+                    metadata = dict(duplicate["metadatas"][0][0] or {})
+                    metadata["hits"] = int(metadata.get("hits", 0)) + int(entry["metadata"].get("hits", 0)) + 1
+                    shard.update(ids=[duplicate["ids"][0][0]], metadatas=[metadata])
+                else:
+                    fresh.append(entry)
+            if fresh:
+                shard.add(ids=[e["id"] for e in fresh], documents=[e["document"] for e in fresh],
+                          metadatas=[e["metadata"] for e in fresh], embeddings=[e["embedding"].tolist() for e in fresh])
+            self.hot.delete(ids=[e["id"] for e in shard_entries])
+            moved += len(shard_entries)
+        return moved
+
+    def _evict(self):
+        evicted = 0
+        age_cutoff = time.time() - self.max_age_days * 86400
+        # Anything past max_age that never proved useful goes first
+        for name, collection in self._archive_shards():
+            stale = collection.get(where={"$and": [{"created_at": {"$lt": age_cutoff}}, {"hits": {"$lt": self.keep_hits}}]},
+                                   include=[])
+            if stale["ids"]:
+                collection.delete(ids=stale["ids"])
+                evicted += len(stale["ids"])
+
+        # Then, while over the cap, the least hit and oldest entries of the oldest shards
+        excess = self.count() - self.max_entries
+        for name, collection in self._archive_shards():
+            if excess <= 0:
+                break
+            found = collection.get(include=["metadatas"])
+            ranked = sorted(zip(found["ids"], found["metadatas"]),
+                            key=lambda item: (int((item[1] or {}).get("hits", 0)), (item[1] or {}).get("created_at", 0)))
+            victims = [item_id for item_id, _ in ranked[:excess]]
+            if victims:
+                collection.delete(ids=victims)
+                evicted += len(victims)
+                excess -= len(victims)
+
+        for name, collection in self._archive_shards():
+            if collection.count() == 0:
+                # Out of the map before it is deleted, so no new query picks it up
+                with self._archives_lock:
+                    del self._archives[name]
+                self.chroma_client.delete_collection(name=name)
+        return evicted
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._flush_hits()
@@ -1,51 +1,126 @@
 import os
 import sys
+import asyncio
 from syslog import Syslog
+from tracing import traced, tracer
 from datetime import datetime, timedelta
-from voice_recognition_n_synth import Synthesizer
-from rcore_online import LanguageCortex_Online
-
-import rcore
+from registry import registry
+from intent_router import CONVERSATIONAL
+from network_monitor import ConnectivityMonitor
+from hedged_router import HedgedRouter, Backend
 
 class RigelCore:
     def __init__(self):
         self.syslog = Syslog(log_file="logs/rigel_core.log")
-        self.prefrontal_cortex = rcore.PreFrontalCortex()
-        self.agentic_cortex = self.prefrontal_cortex.agentic_cortex
-        self.language_cortex = rcore.LanguageCortex()
-        self.language_cortex_online = LanguageCortex_Online()
+        with registry.phase("core components"):
+            self.prefrontal_cortex = registry.get("prefrontal_cortex")
+            self.agentic_cortex = self.prefrontal_cortex.agentic_cortex
+            self.language_cortex = self.prefrontal_cortex.language_cortex
+            self.answer_cache = registry.get("answer_cache")
+        with registry.phase("answer cache warm-up"):
+            try:
+                self.answer_cache.warm(self.language_cortex.long_term_memory.hot)
+            except Exception as e:
+                self.syslog.log(f"Answer cache warm-up skipped: {e}", level="WARNING")
+        self.network_monitor = ConnectivityMonitor()
+        # Opt-in: a slow backend gets raced against the other one after its own p95
+        self.hedge = os.environ.get("RIGEL_HEDGE", "0") == "1"
+        self.router = HedgedRouter({
+            "online": Backend(call=lambda input: self.language_cortex_online.online_call(input, RAG=True),
+                              stream=lambda input: self.language_cortex_online.online_stream(input, RAG=True)),
+            "local": Backend(call=self.prefrontal_cortex.checkInput, stream=self.prefrontal_cortex.checkInput_stream),
+        }, on_error=self._backend_failed)
         self.syslog.log("RigelCore initialized successfully.")
-        
-        
-        
+
+    @property
+    def language_cortex_online(self):
+        # Groq and the SSE tool client are only brought up the first time the network path is taken
+        return registry.get("language_cortex_online")
+
     async def initialize(self):
         """Initialize the system components"""
         self.syslog.log("Initializing Rigel Core components...", level="INFO")
-        await self.prefrontal_cortex.initialize()
-        await self.language_cortex_online.initialize()
+        with registry.phase("MCP tools"):
+            await self.prefrontal_cortex.initialize()
+        with registry.phase("network probe"):
+            await self.network_monitor.start()
+        # Ingesting the command guide is slow, better here than inside the first syscom turn
+        with registry.phase("command guide"):
+            await asyncio.to_thread(registry.get, "vector_db")
+        # Prometheus text on 127.0.0.1:<port>/metrics, a port of 0 turns it off
+        metrics_port = int(os.environ.get("RIGEL_METRICS_PORT", "9464"))
+        if metrics_port > 0:
+            try:
+                tracer.serve_metrics(port=metrics_port)
+                self.syslog.log(f"Metrics endpoint on 127.0.0.1:{metrics_port}/metrics", level="INFO")
+            except OSError as e:
+                self.syslog.log(f"Metrics endpoint unavailable: {e}", level="WARNING")
         self.syslog.log("Rigel Core initialization complete.", level="INFO")
+        registry.report()
 
     def check_network(self):
         """Check if the network is available"""
-        try:
-            import socket
-            socket.create_connection(("www.google.com", 80))
-            self.syslog.log("Network check successful.", level="INFO")
-            return True
-        except OSError:
-            self.syslog.log("Network check failed.", level="ERROR")
-            return False
+        # Cached by the background monitor, never blocks the loop
+        return self.network_monitor.online
 
-    async def getInput(self, input):
-        self.syslog.log(f"Received input: {input}")
+    def _available_backends(self):
         if self.check_network():
             self.syslog.log("Network is available.", level="INFO")
-            output = await self.language_cortex_online.online_call(input, RAG=True)
-        else:
-            self.syslog.log("Network is not available, Accuracy maybe reduced due to local processing /!\"", level="ERROR")
-            output = await self.prefrontal_cortex.checkInput(input)
+            return ["online", "local"]
+        self.syslog.log("Network is not available, Accuracy maybe reduced due to local processing /!\"", level="ERROR")
+        return ["local"]
+
+    def _backend_failed(self, name, error):
+        if name == "online":
+            self.network_monitor.request_probe()
+
+    def _cached_answer(self, input):
+        # Only confidently conversational questions are ever cached, tool and shell requests always run
+        intent, confident = self.prefrontal_cortex.intent_router.route(input)
+        if intent != CONVERSATIONAL or not confident:
+            return False, None
+        answer = self.answer_cache.lookup(input, intent)
+        if answer is not None:
+            self.prefrontal_cortex.language_cortex.embedded_working_memory([input, answer], mode="store")
+            self.syslog.log(f"Answered from cache (hit rate {self.answer_cache.hit_rate():.2%})", level="INFO")
+        return True, answer
+
+    @traced(new_trace=True)
+    async def getInput(self, input):
+        self.syslog.log(f"Received input: {input}")
+        cacheable, cached = await asyncio.to_thread(self._cached_answer, input)
+        if cached is not None:
+            return cached
+        # Only conversational turns are hedged or failed over, a tool call must never run twice
+        output = await self.router.call(input, self._available_backends(), hedge=self.hedge and cacheable,
+                                        failover=cacheable)
         # output = await self.prefrontal_cortex.checkInput(input)
+        if cacheable:
+            self.answer_cache.store(input, output, CONVERSATIONAL)
         return output
+
+    @traced(new_trace=True)
+    async def getInput_stream(self, input):
+        self.syslog.log(f"Received input: {input}")
+        cacheable, cached = await asyncio.to_thread(self._cached_answer, input)
+        if cached is not None:
+            yield cached
+            return
+        stream = self.router.stream(input, self._available_backends(), hedge=self.hedge and cacheable,
+                                    failover=cacheable)
+        parts = []
+        async for token in stream:
+            parts.append(token)
+            yield token
+        if cacheable:
+            self.answer_cache.store(input, "".join(parts), CONVERSATIONAL)
+
+    async def shutdown(self):
+        self.syslog.log("Shutting down Rigel Core components...", level="INFO")
+        await self.network_monitor.stop()
+        tracer.close()
+        await self.agentic_cortex.close()
+        self.language_cortex.close()
         
 
 class VocalBox:
@@ -57,22 +132,26 @@ class VocalBox:
 
 
 async def main():
+    rigel_core = None
     try:
         rigel_core = RigelCore()
-        synth = Synthesizer()
+        synth = registry.get("synthesizer")
         await rigel_core.initialize()
         rigel_core.syslog.log("RigelCore and Synthesizer are ready to use.")
         
         # Example usage
         while True:
-            input_text = input("Enter your input: ")
-            response = await rigel_core.getInput(input_text)
+            # Off the loop, so the network monitor keeps probing while the prompt waits
+            input_text = await asyncio.to_thread(input, "Enter your input: ")
+            response = await synth.speak_stream(rigel_core.getInput_stream(input_text))
             rigel_core.syslog.log(f"Response: {response}")
-            synth.run_synth(f"{response}")
     except Exception as e:
         print(f"Error in main: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        if rigel_core:
+            await rigel_core.shutdown()
 
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from langchain_core.tools import StructuredTool, ToolException
+from syslog import Syslog
+from tracing import traced, span
+
+
+# Tools that are safe to call again after a call whose outcome is unknown (the server died mid-call)
+IDEMPOTENT_TOOLS = frozenset({"open_file", "count_words", "current_time", "tool_cache_stats"})
+
+
+class PooledSession:
+    """One long-lived rigel_mcp.py process and its client session."""
+
+    def __init__(self, server_params, index):
+        self.server_params = server_params
+        self.index = index
+        self.session = None
+        self.last_used = 0.0
+        self.restarts = 0
+        self._task = None
+        self._ready = None
+        self._stop = None
+        self._error = None
+
+    @property
+    def alive(self):
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        # stdio_client has to be entered and exited from the same task, so every
+        # session lives inside its own runner task until stop() is called
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error:
+            raise self._error
+        self.last_used = time.monotonic()
+
+    async def _run(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except Exception:
+            self._task.cancel()
+        self._task = None
+        self.session = None
+
+
+class MCPSessionPool:
+    def __init__(self, server_params, size=2, health_check_interval=30.0, ping_timeout=5.0,
+                 idempotent_tools=IDEMPOTENT_TOOLS):
+        self.server_params = server_params
+        self.idempotent_tools = set(idempotent_tools)
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.syslog = Syslog(log_file="logs/mcp_pool.log")
+        self.slots = [PooledSession(server_params, i) for i in range(self.size)]
+        # Bumped whenever any session (re)starts, callers use it to know when to re-list tools
+        self.generation = 0
+        self._idle = None
+        self._monitor_task = None
+        self._started = False
+        self._start_lock = None
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            await asyncio.gather(*(slot.start() for slot in self.slots))
+            for slot in self.slots:
+                self._idle.put_nowait(slot)
+            self.generation += 1
+            self._started = True
+            if self.health_check_interval:
+                self._monitor_task = asyncio.create_task(self._monitor())
+            self.syslog.log(f"MCP session pool started with {self.size} sessions", level="INFO")
+
+    @traced()
+    async def _restart(self, slot):
+        self.syslog.log(f"Restarting MCP session {slot.index}", level="WARNING")
+        await slot.stop()
+        await slot.start()
+        slot.restarts += 1
+        self.generation += 1
+
+    async def _ping(self, slot):
+        try:
+            await asyncio.wait_for(slot.session.send_ping(), timeout=self.ping_timeout)
+            return True
+        except Exception as e:
+            self.syslog.log(f"MCP session {slot.index} failed health check: {e}", level="ERROR")
+            return False
+
+    async def _ensure_healthy(self, slot):
+        if not slot.alive:
+            await self._restart(slot)
+        elif time.monotonic() - slot.last_used > self.health_check_interval and not await self._ping(slot):
+            await self._restart(slot)
+
+    async def _monitor(self):
+        # Only idle sessions are checked, busy ones prove their health by answering
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            idle = []
+            while not self._idle.empty():
+                idle.append(self._idle.get_nowait())
+            for slot in idle:
+                try:
+                    await self._ensure_healthy(slot)
+                except Exception as e:
+                    self.syslog.log(f"MCP session {slot.index} could not be restarted: {e}", level="ERROR")
+                finally:
+                    self._idle.put_nowait(slot)
+
+    @asynccontextmanager
+    async def session(self):
+        if not self._started:
+            await self.start()
+        slot = await self._idle.get()
+        try:
+            await self._ensure_healthy(slot)
+            yield slot.session
+            slot.last_used = time.monotonic()
+        except (asyncio.CancelledError, McpError):
+            # McpError is the server answering with an error, the session itself is fine
+            raise
+        except Exception:
+            # The server process may have died mid-call, hand back a fresh one
+            try:
+                await self._restart(slot)
+            except Exception as e:
+                self.syslog.log(f"MCP session {slot.index} could not be restarted: {e}", level="ERROR")
+            raise
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def list_tools(self):
+        async with self.session() as session:
+            return (await session.list_tools()).tools
+
+    @traced()
+    async def call_tool(self, name, arguments, retries=1):
+        for attempt in range(retries + 1):
+            sent = False
+            try:
+                async with self.session() as session:
+                    sent = True
+                    return await session.call_tool(name, arguments)
+            except (asyncio.CancelledError, McpError):
+                raise
+            except Exception as e:
+                # Once the request is out the tool may have run, a side-effecting one must not run twice
+                if attempt == retries or (sent and name not in self.idempotent_tools):
+                    raise
+                self.syslog.log(f"Tool call {name} failed ({e}), retrying on a fresh session", level="WARNING")
+
+    async def restart_all(self):
+        # Waits for every session to come back idle so nothing is restarted under a caller
+        if not self._started:
+            await self.start()
+        slots = [await self._idle.get() for _ in range(self.size)]
+        try:
+            for slot in slots:
+                await self._restart(slot)
+        finally:
+            for slot in slots:
+                self._idle.put_nowait(slot)
+
+    def to_langchain_tools(self, mcp_tools):
+        return [self._to_langchain_tool(tool) for tool in mcp_tools]
+
+    def _to_langchain_tool(self, tool):
+        async def call_tool(**arguments):
+            with span(f"mcp_tool:{tool.name}"):
+                result = await self.call_tool(tool.name, arguments)
+            text_parts = []
+            artifacts = []
+            for content in result.content:
+                if getattr(content, "type", None) == "text":
+                    text_parts.append(content.text)
+                else:
+                    artifacts.append(content)
+            text = "\n".join(text_parts)
+            if result.isError:
+                raise ToolException(text)
+            return text, (artifacts or None)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+        )
+
+    async def close(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        for slot in self.slots:
+            await slot.stop()
+        self._started = False
+        self.syslog.log("MCP session pool closed", level="INFO")
+
+
+def default_server_params():
+    # RIGEL_MCP_SERVER swaps in another server script, e.g. the replay stand-in
+    return StdioServerParameters(command="python", args=[os.environ.get("RIGEL_MCP_SERVER", "rigel_mcp.py")])
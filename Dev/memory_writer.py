@@ -0,0 +1,135 @@
+import atexit
+import queue
+import threading
+import time
+from syslog import Syslog
+
+
+class MemoryWriter:
+    """Write-behind queue for Chroma inserts.
+
+    Turns hand their memory writes over and return straight away, a single
+    background thread batches whatever has queued up into one collection.add
+    per collection. close() (also registered with atexit) drains the queue.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_queue=1024, batch_size=32, flush_interval=0.5, put_timeout=5.0):
+        self.syslog = Syslog(log_file="logs/memory_writer.log")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "failed": 0, "inline": 0}
+        # Stats are bumped from the callers and the writer thread alike
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "depth": self.depth}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def submit(self, collection, document, metadata, item_id):
+        item = (collection, document, metadata, item_id)
+        if self._closed:
+            self._write([item])
+            return
+        try:
+            # A full queue pushes back on the caller for a bit before writing inline
+            self._queue.put(item, timeout=self.put_timeout)
+            self._count(submitted=1)
+        except queue.Full:
+            self.syslog.log(f"Memory write queue full ({self.depth}), writing inline", level="WARNING")
+            self._count(inline=1)
+            self._write([item])
+            return
+        if self._closed:
+            # close() ran between the check above and the put, nobody else will pick this up
+            self._drain()
+
+    def _write(self, items):
+        by_collection = {}
+        for collection, document, metadata, item_id in items:
+            batch = by_collection.setdefault(_collection_key(collection), (collection, [], [], []))
+            batch[1].append(document)
+            batch[2].append(metadata)
+            batch[3].append(item_id)
+        for collection, documents, metadatas, ids in by_collection.values():
+            try:
+                collection.add(documents=documents, metadatas=metadatas, ids=ids)
+                self._count(written=len(ids), batches=1)
+            except Exception as e:
+                self._count(failed=len(ids))
+                self.syslog.log(f"Memory write of {len(ids)} items to {collection.name} failed: {e}", level="ERROR")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                self._queue.task_done()
+                break
+            items = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # Gather whatever arrives within the flush window, up to a batch
+            while len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is self._STOP:
+                    stop = True
+                    break
+                items.append(nxt)
+            self._write(items)
+            for _ in range(len(items) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                break
+
+    def _drain(self):
+        # Writes whatever is still queued once the thread is gone, each item marked done so flush() returns
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if leftovers:
+                self._write(leftovers)
+        finally:
+            for _ in leftovers:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._drain()
+        self.syslog.log(f"Memory writer closed: {self.stats()}", level="INFO")
+
+
+def _collection_key(collection):
+    return getattr(collection, "name", id(collection))
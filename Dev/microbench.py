@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_FILE_MB = (1, 10, 100)
+
+_VERBS = ["list", "remove", "copy", "compress", "mount", "kill", "find", "archive", "inspect", "restart", "trace", "sync"]
+_NOUNS = ["files", "processes", "directory", "disk", "service", "logs", "packages", "network", "socket", "kernel",
+          "permissions", "archive", "partition", "user", "cron job", "container"]
+
+
+def _make_fake_embedding_function(dim=384):
+    from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+    import numpy as np
+
+    class HashEmbeddingFunction(EmbeddingFunction):
+        """Signed feature hashing of the words, normalized. Offline, deterministic and cheap,
+        and texts sharing words still land close together so queries return something sensible."""
+
+        def __init__(self, dim=dim):
+            self.dim = dim
+
+        def __call__(self, input: Documents) -> Embeddings:
+            vectors = []
+            for text in input:
+                vector = np.zeros(self.dim, dtype=np.float32)
+                for word in re.findall(r"\w+", text.lower()):
+                    h = zlib.crc32(word.encode("utf-8"))
+                    vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+                norm = np.linalg.norm(vector)
+                vectors.append(vector / norm if norm else vector)
+            return vectors
+
+    return HashEmbeddingFunction()
+
+
+def summarize(samples):
+    samples = sorted(samples)
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, max(0, int(round(p / 100 * len(samples) + 0.5)) - 1))]
+
+    return {"n": len(samples), "min": samples[0], "mean": sum(samples) / len(samples), "p50": percentile(50),
+            "p95": percentile(95), "p99": percentile(99), "max": samples[-1]}
+
+
+class MicroBench:
+    """Times the memory, retrieval and tool hot paths against Chroma collections of a given size.
+
+    Each size gets its own directory under root holding a Chroma store with
+    that many long-term and working memory rows and a generated command guide
+    of about as many chunks. Fixtures are kept and reused while their counts
+    still match, so only the first run at a size pays for populating it.
+    """
+
+    def __init__(self, root, repeat=50, warmup=3, embedding="fake", only=None, cold=False, seed=7):
+        self.root = os.path.abspath(root)
+        self.repeat = repeat
+        self.warmup = warmup
+        self.embedding = embedding
+        self.only = re.compile(only) if only else None
+        self.cold = cold
+        self.random = random.Random(seed)
+        self.results = []
+
+    # -- plumbing
+
+    def wanted(self, name):
+        return self.only is None or bool(self.only.search(name))
+
+    def measure(self, name, size, call, repeat=None, setup=None, **extra):
+        """Runs call() warmup + repeat times, setup() (untimed) before each, and records the timings."""
+        if not self.wanted(name):
+            return None
+        for _ in range(self.warmup):
+            if setup:
+                setup()
+            call()
+        samples = []
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - started)
+        return self.record(name, size, samples, **extra)
+
+    def record(self, name, size, samples, **extra):
+        result = {"benchmark": name, "size": size, **summarize(samples), **extra}
+        self.results.append(result)
+        print(f"{name:<36} {str(size):>8}  p50 {result['p50'] * 1000:10.3f} ms  p95 {result['p95'] * 1000:10.3f} ms",
+              file=sys.stderr)
+        return result
+
+    def _workdir(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.join(path, "logs"), exist_ok=True)
+        os.chdir(path)
+        return path
+
+    def _embedding_function(self):
+        from embedding_cache import CachedEmbeddingFunction, get_shared_embedding_function
+        if self.embedding == "fake":
+            # Same cache layer as production, with the model swapped for hashing
+            return CachedEmbeddingFunction(base=_make_fake_embedding_function(), persist_dir=None)
+        return get_shared_embedding_function()
+
+    def _question(self, n):
+        return f"how do I {_VERBS[n % len(_VERBS)]} the {_NOUNS[(n // len(_VERBS)) % len(_NOUNS)]} number {n}"
+
+    def _queries(self, count=64):
+        # Fresh wording each time so the embedding cache does not turn every query into a hit
+        return [f"what is the way to {self.random.choice(_VERBS)} {self.random.choice(_NOUNS)} on host {self.random.randrange(10**6)}"
+                for _ in range(count)]
+
+    @staticmethod
+    def _batch_size(client):
+        limit = getattr(client, "get_max_batch_size", None)
+        return min(5000, limit() if limit else getattr(client, "max_batch_size", 5000))
+
+    # -- fixtures
+
+    def _fill(self, client, collection, size, make_row):
+        missing = size - collection.count()
+        if missing <= 0:
+            return 0.0
+        started = time.perf_counter()
+        batch = self._batch_size(client)
+        start = collection.count()
+        for offset in range(start, size, batch):
+            rows = [make_row(n) for n in range(offset, min(size, offset + batch))]
+            collection.add(ids=[row[0] for row in rows], documents=[row[1] for row in rows], metadatas=[row[2] for row in rows])
+        return time.perf_counter() - started
+
+    def _memory_row(self, n):
+        now = time.time()
+        question = self._question(n)
+        answer = f"Use the {_VERBS[n % len(_VERBS)]} command with the right flags, see entry {n} of the guide."
+        return f"qa_{n + 1}", answer, {"question": question, "answer": answer, "created_at": now - n, "hits": n % 5}
+
+    def _working_row(self, n):
+        now = time.time()
+        question = self._question(n)
+        # Spread over many sessions, one in a hundred on the default one the CLI uses
+        session = "default" if n % 100 == 0 else f"bench-{n % 97}"
+        return f"working_{n + 1}", question, {"question": question, "answer": f"answer {n}", "created_at": now - n,
+                                              "expires_at": now + 86400 * 365, "session": session}
+
+    def _write_guide(self, directory, size, sections_per_file=50):
+        # About one chunk per section: a heading, a synopsis and a paragraph of ~600 chars
+        if os.path.isdir(directory) and len(os.listdir(directory)) == -(-size // sections_per_file):
+            return
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        for first in range(0, size, sections_per_file):
+            lines = [f"# Command guide part {first // sections_per_file}", ""]
+            for n in range(first, min(size, first + sections_per_file)):
+                verb, noun = _VERBS[n % len(_VERBS)], _NOUNS[n % len(_NOUNS)]
+                lines += [f"## {verb}-{noun}-{n}", "", f"    {verb} --{noun.replace(' ', '-')} [options] target{n}", "",
+                          " ".join([f"Runs {verb} over the {noun} given as target{n} and reports what changed."] * 8), ""]
+            with open(os.path.join(directory, f"part_{first // sections_per_file:05d}.md"), 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines))
+
+    def _setup_size(self, size):
+        """Points the registry at this size's store and returns (client, fixture build seconds)."""
+        import chromadb
+        from registry import registry
+        from id_allocator import IdAllocator
+        from memory_writer import MemoryWriter
+
+        self._workdir(str(size))
+        client = chromadb.PersistentClient(path="chromadb")
+        registry.override("chroma", client)
+        registry.override("id_allocator", IdAllocator("chromadb/id_counters.json"))
+        registry.override("memory_writer", MemoryWriter())
+        embedding_function = registry.get("embedding_function")
+        built = {}
+        memory = client.get_or_create_collection(name="rigel_memory", embedding_function=embedding_function)
+        built["rigel_memory"] = self._fill(client, memory, size, self._memory_row)
+        working = client.get_or_create_collection(name="working_memory", embedding_function=embedding_function)
+        built["working_memory"] = self._fill(client, working, size, self._working_row)
+        self._write_guide(os.path.abspath("syscom"), size)
+        os.environ["RIGEL_SYSCOM_SOURCES"] = "syscom"
+        return client, built
+
+    # -- benchmarks
+
+    def bench_memory(self, size, client):
+        from registry import registry
+        from rcore import LanguageCortex
+        from working_memory import WorkingMemory
+
+        language_cortex = LanguageCortex(chroma_client=client)
+        writer = registry.get("memory_writer")
+        queries = iter(self._queries(10 * (self.repeat + self.warmup)))
+
+        self.measure("rag_query", size, lambda: language_cortex.RAG(next(queries), "query"))
+        turns = iter(range(10 * (self.repeat + self.warmup)))
+        self.measure("rag_input", size, lambda: language_cortex.RAG([self._question(next(turns)), "benchmark answer"], "input"))
+        # What the writer thread then spends getting those into Chroma
+        self.measure("rag_input_flush", size, writer.flush, repeat=max(3, self.repeat // 10),
+                     setup=lambda: [language_cortex.RAG([self._question(n), "benchmark answer"], "input") for n in range(32)])
+
+        self.measure("working_memory_store", size,
+                     lambda: language_cortex.embedded_working_memory([self._question(next(turns)), "benchmark answer"], mode="store"))
+        writer.flush()
+        self.measure("working_memory_query", size, lambda: language_cortex.embedded_working_memory(None, mode="query"))
+        self.measure("working_memory_clear", size, lambda: language_cortex.embedded_working_memory(None, mode="clear"))
+        # The periodic persisted sweep, forced due on every iteration
+        working_memory = language_cortex.working_memory
+        self.measure("working_memory_clear_purge", size, lambda: language_cortex.embedded_working_memory(None, mode="clear"),
+                     setup=lambda: setattr(working_memory, "_last_purge", 0.0))
+        # Startup recovery, once for the default session and once for a tagged one
+        collection = language_cortex.working_memory_collection
+        self.measure("working_memory_recover_default", size, lambda: WorkingMemory(collection=collection), repeat=max(3, self.repeat // 10))
+        self.measure("working_memory_recover_session", size, lambda: WorkingMemory(collection=collection, session_id="bench-1"),
+                     repeat=max(3, self.repeat // 10))
+
+        language_cortex.long_term_memory.close()
+        writer.close()
+
+    def bench_vectordb(self, size, client):
+        from db_init import VectorDB
+
+        if self.cold or not os.path.exists(os.path.join("chromadb", "rag_syscom_manifest.json")):
+            if self.cold:
+                for stale in ("rag_syscom_manifest.json", "rag_syscom_bm25.json"):
+                    if os.path.exists(os.path.join("chromadb", stale)):
+                        os.remove(os.path.join("chromadb", stale))
+                if "rag_syscom" in [getattr(c, "name", c) for c in client.list_collections()]:
+                    client.delete_collection(name="rag_syscom")
+            vector_db = VectorDB()
+            started = time.perf_counter()
+            vector_db.loadDataToVectorDB()
+            self.record("vectordb_load_cold", size, [time.perf_counter() - started], chunks=vector_db.collection.count())
+
+        vector_db = VectorDB()
+        self.measure("vectordb_load_unchanged", size, vector_db.loadDataToVectorDB, repeat=max(3, self.repeat // 10))
+        # One file rewritten with new text: extract, chunk and embed just that page, then rebuild BM25
+        guide = os.path.join("syscom", sorted(os.listdir("syscom"))[0])
+        with open(guide, 'r', encoding='utf-8') as f:
+            original = f.read()
+
+        def edit():
+            with open(guide, 'w', encoding='utf-8') as f:
+                f.write(original + f"\n\n## bench-edit\n\nEdited at {time.perf_counter()}\n")
+
+        self.measure("vectordb_load_one_file_changed", size, vector_db.loadDataToVectorDB, repeat=max(3, self.repeat // 10), setup=edit)
+        with open(guide, 'w', encoding='utf-8') as f:
+            f.write(original)
+        vector_db.loadDataToVectorDB()
+
+        queries = iter(self._queries(10 * (self.repeat + self.warmup)))
+        self.measure("vectordb_retriever", size, lambda: vector_db.retriever(next(queries)),
+                     chunks=vector_db.collection.count())
+        self.measure("vectordb_retriever_expand", size, lambda: vector_db.retriever(next(queries), expand=1))
+
+    def bench_tools(self, file_sizes_mb):
+        if not (self.wanted("open_file") or self.wanted("execute_system_command") or self.wanted("subprocess_baseline")):
+            return
+        self._workdir("tools")
+        try:
+            import rigel_mcp
+        except ImportError as e:
+            print(f"Skipping tool benchmarks, rigel_mcp does not import: {e}", file=sys.stderr)
+            return
+
+        for megabytes in file_sizes_mb:
+            path = os.path.abspath(f"large_{megabytes}mb.py")
+            if not os.path.exists(path) or os.path.getsize(path) < megabytes * 1024 * 1024:
+                line = "def handler(event, context):  # generated line for the open_file benchmark\n"
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(line * (megabytes * 1024 * 1024 // len(line) + 1))
+            # Uncached is the tool body itself, cached is what a repeat within the stat TTL costs
+            self.measure("open_file", f"{megabytes}MB", lambda: rigel_mcp.open_file.__wrapped__(path, 50),
+                         repeat=max(3, self.repeat // 10))
+            self.measure("open_file_cached", f"{megabytes}MB", lambda: rigel_mcp.open_file(path, 50))
+
+        # The tool's own cost on top of spawning the same process directly
+        baseline = self.measure("subprocess_baseline", None, lambda: subprocess.run(["true"], capture_output=True, text=True, timeout=30))
+        tool = self.measure("execute_system_command", None, lambda: rigel_mcp.execute_system_command.__wrapped__("true"))
+        if baseline and tool:
+            tool["overhead_p50"] = tool["p50"] - baseline["p50"]
+        self.measure("execute_system_command_cached", None, lambda: rigel_mcp.execute_system_command("ls -la"))
+
+    def run(self, sizes, file_sizes_mb):
+        from registry import registry
+
+        os.makedirs(self.root, exist_ok=True)
+        # The benchmarks never talk to Groq, but LanguageCortex refuses to start without a key
+        os.environ.setdefault("GROQ_API_KEY", "microbench")
+        registry.override("embedding_function", self._embedding_function())
+        fixtures = {}
+        for size in sizes:
+            client, built = self._setup_size(size)
+            fixtures[size] = {name: round(seconds, 3) for name, seconds in built.items()}
+            if any(self.wanted(name) for name in ("rag", "working_memory")):
+                self.bench_memory(size, client)
+            if self.wanted("vectordb"):
+                self.bench_vectordb(size, client)
+        self.bench_tools(file_sizes_mb)
+        return {
+            "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                     "platform": platform.platform(), "embedding": self.embedding, "repeat": self.repeat,
+                     "warmup": self.warmup, "sizes": list(sizes), "fixture_build_seconds": fixtures},
+            "results": self.results,
+        }
+
+
+def _ints(text):
+    return [int(part.replace("_", "").replace("k", "000")) for part in text.split(",") if part]
+
+
+def main():
+    dev_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, dev_dir)
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the memory, retrieval and tool hot paths.")
+    parser.add_argument("--sizes", type=_ints, default=list(DEFAULT_SIZES), help="collection sizes, e.g. 1k,10k,100k")
+    parser.add_argument("--file-mb", type=_ints, default=list(DEFAULT_FILE_MB), help="open_file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--embedding", choices=("fake", "real"), default="fake",
+                        help="fake hashes words and runs fully offline, real uses the production embedding model")
+    parser.add_argument("--fixtures", default=None, help="directory to keep fixtures in between runs, default a temp dir")
+    parser.add_argument("--only", default=None, help="regex on benchmark names")
+    parser.add_argument("--cold", action="store_true", help="rebuild the command guide collection to time a cold load")
+    parser.add_argument("--out", default="-", help="where to write the JSON results, - for stdout")
+    args = parser.parse_args()
+
+    root = args.fixtures or tempfile.mkdtemp(prefix="rigel_microbench_")
+    cwd = os.getcwd()
+    try:
+        results = MicroBench(root, args.repeat, args.warmup, args.embedding, args.only, args.cold).run(args.sizes, args.file_mb)
+    finally:
+        os.chdir(cwd)
+        if not args.fixtures:
+            shutil.rmtree(root, ignore_errors=True)
+    payload = json.dumps(results, indent=2)
+    if args.out == "-":
+        print(payload)
+    else:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(payload + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from syslog import Syslog
+
+
+def _parse_target(target):
+    host, _, port = target.rpartition(":")
+    return (host, int(port)) if host else (target, 80)
+
+
+class ConnectivityMonitor:
+    """Probes a TCP endpoint in the background and keeps a cached online/offline state.
+
+    The state only flips after up_threshold consecutive successes (or
+    down_threshold consecutive failures), so one dropped probe does not bounce
+    every request between the online and the local path. Reading it never blocks.
+    """
+
+    def __init__(self, target=None, interval=10.0, timeout=1.5, up_threshold=2, down_threshold=2):
+        self.syslog = Syslog(log_file="logs/network_monitor.log")
+        # host:port, anything reachable that means "the online path will work" (the Groq API, a local proxy, ...)
+        self.host, self.port = _parse_target(target or os.environ.get("RIGEL_NETWORK_TARGET", "www.google.com:80"))
+        self.interval = interval
+        self.timeout = timeout
+        self.up_threshold = up_threshold
+        self.down_threshold = down_threshold
+        self._online = None
+        self._streak = 0
+        self._task = None
+        self._wake = None
+        self.last_probe = None
+        self.last_latency = None
+        self.stats = {"probes": 0, "failures": 0, "transitions": 0}
+
+    @property
+    def online(self):
+        # Unknown (never probed) counts as offline, the local path always works
+        return bool(self._online)
+
+    async def probe(self):
+        started = time.perf_counter()
+        self.stats["probes"] += 1
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.stats["failures"] += 1
+            return False
+        except Exception as e:
+            # Anything else (a malformed target, ...) still means the endpoint can't be reached
+            self.stats["failures"] += 1
+            self.syslog.log(f"Probe of {self.host}:{self.port} failed: {e!r}", level="WARNING")
+            return False
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            pass
+        self.last_latency = time.perf_counter() - started
+        return True
+
+    def _record(self, success):
+        self.last_probe = time.time()
+        if self._online is None:
+            self._set(success)
+            return
+        if success == self._online:
+            self._streak = 0
+            return
+        self._streak += 1
+        if self._streak >= (self.up_threshold if success else self.down_threshold):
+            self._set(success)
+
+    def _set(self, online):
+        if online != self._online:
+            if self._online is not None:
+                self.stats["transitions"] += 1
+            self.syslog.log(f"Network is now {'online' if online else 'offline'} ({self.host}:{self.port})",
+                            level="INFO" if online else "WARNING")
+        self._online = online
+        self._streak = 0
+
+    async def check_now(self):
+        self._record(await self.probe())
+        return self.online
+
+    def request_probe(self):
+        # Callers that just saw a request fail can ask for an early re-check instead of waiting out the interval
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.check_now()
+            except Exception as e:
+                # A dead monitor would freeze the state for good, log it and probe again next interval
+                self.syslog.log(f"Network monitor error: {e!r}", level="ERROR")
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        # One probe up front, bounded by timeout, so the first request sees a real state
+        await self.check_now()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,21 +1,19 @@
 import asyncio
 import re
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langgraph.prebuilt import create_react_agent
-from langchain_ollama import ChatOllama
+import threading
 from ollama import chat
 from ollama import ChatResponse
-from pypdf import PdfReader
-from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
-import chromadb
-from datetime import datetime, timedelta
 import time
 from syslog import Syslog
-from voice_recognition_n_synth import Synthesizer
-from db_init import VectorDB
-from groq import Groq
+from tracing import traced
+from streaming import ThreadedStream
+from working_memory import WorkingMemory, current_session
+from long_term_memory import TieredMemory
+from context_assembler import ContextAssembler
+from intent_router import CONVERSATIONAL, TOOL, SYSCOM
+from llm_scheduler import INTERACTIVE, ROUTING, SPECULATIVE, BACKGROUND
+from context_assembler import count_tokens
+from registry import registry
 import os
 from dotenv import load_dotenv
 
@@ -23,19 +21,34 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class PreFrontalCortex:
-    def __init__(self):
+    def __init__(self, speculative=None):
         self.syslog = Syslog(log_file="logs/preftrontal_cortex.log")
         self.syslog.log("PreFrontalCortex initialized.", level="INFO")
         self.executor = None
-        self.language_cortex = LanguageCortex()
-        self.agentic_cortex = AgenticCortex()
+        self.language_cortex = registry.get("language_cortex")
+        self.agentic_cortex = registry.get("agentic_cortex")
         self.monologue = self.language_cortex.ollama_call
+        self.intent_router = registry.get("intent_router")
         self._tools_initialized = False
+        # Opt-in: start the RAG answer and the syscom lookup while routing is still running
+        if speculative is None:
+            speculative = os.environ.get("RIGEL_SPECULATIVE", "0") == "1"
+        self.speculative = speculative
+        self.speculation_stats = {"turns": 0, "rag_used": 0, "rag_wasted": 0, "syscom_used": 0, "syscom_wasted": 0}
         self.syslog.log("PreFrontalCortex ready to run.", level="INFO")
-        self.syscom_db = VectorDB()
-        self.syscom_db.loadDataToVectorDB()
-        self.synth = Synthesizer()
-        self.syslog.log("Vector DB Containing System Commands Loaded & Started successfully !")
+
+    # The command guide and the voice are only needed once a turn actually gets there
+    @property
+    def syscom_db(self):
+        return registry.get("vector_db")
+
+    @property
+    def synth(self):
+        return registry.get("synthesizer")
+
+    def _retrieve(self, input):
+        # Runs on a worker thread, so a first-time vector_db build never lands on the event loop
+        return self.syscom_db.retriever(input)
 
     def set_executor(self, executor):
         self.executor = executor
@@ -48,16 +61,10 @@ class PreFrontalCortex:
             self._tools_initialized = True
             self.syslog.log("Tools initialized successfully.", level="INFO")
             
-    async def checkInput(self, input):
-        if not self._tools_initialized:
-            self.syslog.log("Tools not initialized, initializing now...", level="INFO")
-            await self.initialize()
-            
+    @traced()
+    def _llm_route(self, input):
+        # Slow path, only used when the embedding router can't separate the routes
         tools_list = self.agentic_cortex.tools
-        tool_names = [tool.name for tool in tools_list] if tools_list else [] # Yea this is pretty in-efficient i admit
-        # What ? You got a more efficient way ?. Open a PR then instead of whining about it
-        
-        # Create a more detailed prompt with tool descriptions
         tool_descriptions = []
         for tool in tools_list:
             if hasattr(tool, 'description') and tool.description:
@@ -87,110 +94,271 @@ class PreFrontalCortex:
                                     Answer NO only if it's a simple conversational question that doesn't need tools.
                                     YES or NO (one word only):"""
         self.syslog.log(f"Checking input: {innermonologue_prompt}", level="INFO")
-        response = self.monologue(innermonologue_prompt, RAG=False)
+        response = self.monologue(innermonologue_prompt, RAG=False, persist=False, priority=ROUTING)
         self.syslog.log(f"Monologue response: {response.strip().replace('.','')}", level="INFO")
 
+        response_clean = response.strip().lower().replace('.', '').replace(':', '')
+        if not (re.search(r'\b(yes|y|true|1)\b', response_clean) or response_clean.startswith('yes')):
+            return CONVERSATIONAL
+
+        innermonologue_prompt = f"Yes or No ? (one word answer). Does this input require a commandline level execution ? prompt:{input}"
+        response = self.monologue(innermonologue_prompt, RAG=False, persist=False, priority=ROUTING)
+        self.syslog.log(f"Monologue response: {response.strip().replace('.','')}", level="INFO")
         response_clean = response.strip().lower().replace('.', '').replace(':', '')
         if re.search(r'\b(yes|y|true|1)\b', response_clean) or response_clean.startswith('yes'):
-            self.syslog.log("Input requires tool invocation.", level="INFO")
-            self.synth.run_synth("Invoking required tool")
-            needs_tool =  True
+            return SYSCOM
+        return TOOL
+
+    @traced()
+    async def checkInput(self, input):
+        if not self._tools_initialized:
+            self.syslog.log("Tools not initialized, initializing now...", level="INFO")
+            await self.initialize()
+
+        if self.speculative:
+            return await self._speculative_check(input)
+
+        route, confident = await asyncio.to_thread(self.intent_router.route, input, self._llm_route)
+        self.syslog.log(f"Input routed to '{route}' (confident={confident})", level="INFO")
+
+        if route in (TOOL, SYSCOM):
+            context = None
+            if route == SYSCOM:
+                context = await asyncio.to_thread(self._retrieve, input)
+            return await self._run_agent(input, route, context)
         else:
             self.syslog.log("Input does not require tool invocation.", level="INFO")
-            needs_tool =  False
-
-        if needs_tool:
-            innermonologue_prompt = f"Yes or No ? (one word answer). Does this input require a commandline level execution ? prompt:{input}"
-            response = self.monologue(innermonologue_prompt, RAG=False)
-            response_clean = response.strip().lower().replace('.', '').replace(':', '')
-            if re.search(r'\b(yes|y|true|1)\b', response_clean) or response_clean.startswith('yes'):
-                self.syslog.log(f"Monologue response: {response.strip().replace('.','')}", level="INFO")
-                self.syslog.log("Input requires syscom context", level="INFO")
-                context = self.syscom_db.retriever(input)
-                input = input + str(f"Command Guide: {context}")
+            self.syslog.log("Invocation skipping")
+            # The router may cancel this call when a hedge wins, the thread has to stop too and
+            # the answer is only remembered once it is actually returned
+            cancel_event = threading.Event()
+            try:
+                answer = await asyncio.to_thread(self.language_cortex.ollama_call, input, True, False, cancel_event)
+            except asyncio.CancelledError:
+                cancel_event.set()
+                raise
+            self.language_cortex.remember(input, answer)
+            return answer
+
+    async def _speculative_check(self, input):
+        # Start both candidate branches while the route is still being decided,
+        # the RAG answer is generated without persisting so a losing branch leaves no trace
+        cancel_event = threading.Event()
+        rag_task = asyncio.create_task(asyncio.to_thread(
+            self.language_cortex.ollama_call, input, True, False, cancel_event, SPECULATIVE))
+        syscom_task = asyncio.create_task(asyncio.to_thread(self._retrieve, input))
+        self.speculation_stats["turns"] += 1
+
+        try:
+            route, confident = await asyncio.to_thread(self.intent_router.route, input, self._llm_route)
+            self.syslog.log(f"Input routed to '{route}' (confident={confident}, speculative)", level="INFO")
+
+            if route == CONVERSATIONAL:
+                syscom_task.cancel()
+                self.speculation_stats["syscom_wasted"] += 1
+                answer = await rag_task
+                self.speculation_stats["rag_used"] += 1
+                # Only queues the writes, and no await here so a cancel can't land between answer and memory
+                self.language_cortex.remember(input, answer)
+                return answer
+
+            cancel_event.set()
+            rag_task.cancel()
+            self.speculation_stats["rag_wasted"] += 1
+            context = None
+            if route == SYSCOM:
+                context = await syscom_task
+                self.speculation_stats["syscom_used"] += 1
             else:
-                self.syslog.log("Input does not require syscom context", level="INFO")
-            # Removed the incorrect "needs_tool = False" line that was causing tools to be bypassed
-            self.syslog.log("Invocation running")
-            response = await self.agentic_cortex.initialize_tools(message=input)
-            self.syslog.log(f"Tool invocation response: {response}")
-            for message in reversed(response):
-                if hasattr(message, 'content') and message.__class__.__name__ == 'AIMessage':
-                    return message.content
-            return str(response)
+                syscom_task.cancel()
+                self.speculation_stats["syscom_wasted"] += 1
+            return await self._run_agent(input, route, context)
+        finally:
+            if not rag_task.done():
+                cancel_event.set()
+                rag_task.cancel()
+            if not syscom_task.done():
+                syscom_task.cancel()
+            self.syslog.log(f"Speculation stats: {self.speculation_stats}", level="INFO")
+
+    @traced()
+    async def checkInput_stream(self, input):
+        if not self._tools_initialized:
+            self.syslog.log("Tools not initialized, initializing now...", level="INFO")
+            await self.initialize()
+
+        cancel_event = threading.Event()
+        rag_stream = None
+        syscom_task = None
+        if self.speculative:
+            self.speculation_stats["turns"] += 1
+            rag_stream = ThreadedStream(lambda: self.language_cortex.ollama_stream(input, True, False, cancel_event,
+                                                                                   SPECULATIVE))
+            syscom_task = asyncio.create_task(asyncio.to_thread(self._retrieve, input))
+
+        try:
+            route, confident = await asyncio.to_thread(self.intent_router.route, input, self._llm_route)
+            self.syslog.log(f"Input routed to '{route}' (confident={confident}, streaming)", level="INFO")
+
+            if route == CONVERSATIONAL:
+                if syscom_task:
+                    syscom_task.cancel()
+                    self.speculation_stats["syscom_wasted"] += 1
+                    self.speculation_stats["rag_used"] += 1
+                else:
+                    rag_stream = ThreadedStream(lambda: self.language_cortex.ollama_stream(input, True, False, cancel_event))
+                parts = []
+                async for token in rag_stream:
+                    parts.append(token)
+                    yield token
+                await asyncio.to_thread(self.language_cortex.remember, input, "".join(parts))
+                return
+
+            if rag_stream:
+                cancel_event.set()
+                rag_stream.cancel()
+                self.speculation_stats["rag_wasted"] += 1
+            context = None
+            if route == SYSCOM:
+                if syscom_task:
+                    context = await syscom_task
+                    self.speculation_stats["syscom_used"] += 1
+                else:
+                    context = await asyncio.to_thread(self._retrieve, input)
+            elif syscom_task:
+                syscom_task.cancel()
+                self.speculation_stats["syscom_wasted"] += 1
+            async for token in self._stream_agent(input, route, context):
+                yield token
+        finally:
+            cancel_event.set()
+            if rag_stream:
+                rag_stream.cancel()
+            if syscom_task and not syscom_task.done():
+                syscom_task.cancel()
+
+    async def _stream_agent(self, input, route, context=None):
+        self.syslog.log("Input requires tool invocation.", level="INFO")
+        await asyncio.to_thread(self.synth.run_synth, "Invoking required tool")
+        if route == SYSCOM:
+            self.syslog.log("Input requires syscom context", level="INFO")
+            context = self.language_cortex.context_assembler.fit_syscom(context)
+            input = input + str(f"Command Guide: {context}")
+        self.syslog.log("Invocation running (streaming)")
+        async for token in self.agentic_cortex.stream_tools(message=input):
+            yield token
+
+    async def _run_agent(self, input, route, context=None):
+        self.syslog.log("Input requires tool invocation.", level="INFO")
+        await asyncio.to_thread(self.synth.run_synth, "Invoking required tool")
+        if route == SYSCOM:
+            self.syslog.log("Input requires syscom context", level="INFO")
+            context = self.language_cortex.context_assembler.fit_syscom(context)
+            input = input + str(f"Command Guide: {context}")
         else:
-            self.syslog.log("Invocation skipping")
-            return self.language_cortex.ollama_call(input, RAG=True)
+            self.syslog.log("Input does not require syscom context", level="INFO")
+        self.syslog.log("Invocation running")
+        response = await self.agentic_cortex.initialize_tools(message=input)
+        self.syslog.log(f"Tool invocation response: {response}")
+        for message in reversed(response):
+            if hasattr(message, 'content') and message.__class__.__name__ == 'AIMessage':
+                return message.content
+        return str(response)
 
 # Cool name huh
 class AgenticCortex:
-    def __init__(self, model_name="Rigel"):
+    def __init__(self, model_name="Rigel", pool_size=None):
+        from langchain_ollama import ChatOllama
+        from mcp_pool import MCPSessionPool, default_server_params
+        from tool_executor import ToolExecutor
         self.model = ChatOllama(model=model_name)
         self.tools = []
+        self.agent = None
         self._initialized = False
+        self._tools_generation = None
+        self._tools_fingerprint = None
+        self._agent_lock = asyncio.Lock()
         self.syslog = Syslog(log_file="logs/agentic_cortex.log")
+        if pool_size is None:
+            pool_size = int(os.environ.get("RIGEL_MCP_POOL_SIZE", "2"))
+        self.mcp_pool = MCPSessionPool(default_server_params(), size=pool_size)
+        # Independent tool calls of one step run side by side, each on its own pooled session
+        self.tool_executor = ToolExecutor.from_env()
         self.syslog.log(f"AgenticCortex initialized with model: {model_name}", level="INFO")
         self.syslog.log("AgenticCortex ready to run.", level="INFO")
 
+    async def _refresh_agent(self):
+        # Tools are only re-listed after a session (re)start, and the agent is only
+        # rebuilt when the listed tools actually differ from what it was compiled with
+        async with self._agent_lock:
+            if self._initialized and self._tools_generation == self.mcp_pool.generation:
+                return self.agent
+            if not self._initialized:
+                self.syslog.log("Tools not initialized, initializing now...", level="INFO")
+            mcp_tools = await self.mcp_pool.list_tools()
+            self._tools_generation = self.mcp_pool.generation
+            fingerprint = tuple((tool.name, tool.description, str(tool.inputSchema)) for tool in mcp_tools)
+            if fingerprint != self._tools_fingerprint:
+                from tool_executor import create_parallel_react_agent
+                self.tools = self.mcp_pool.to_langchain_tools(mcp_tools)
+                self.agent = create_parallel_react_agent(self.model, self.tools, self.tool_executor,
+                                                         scheduler=registry.get("llm_scheduler"), backend="ollama")
+                self._tools_fingerprint = fingerprint
+                self.syslog.log(f"Tools initialized: {len(self.tools)} tools loaded", level="INFO")
+            self._initialized = True
+            return self.agent
+
     async def show_tools(self):
-        if not self._initialized:
-            self.syslog.log("Tools not initialized, initializing now...", level="INFO")
-            server_params = StdioServerParameters(
-                command="python",
-                args=["rigel_mcp.py"],
-            )
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    self.tools = await load_mcp_tools(session)
-                    self._initialized = True
-                    self.syslog.log(f"Tools initialized: {len(self.tools)} tools loaded", level="INFO")
+        await self._refresh_agent()
         return self.tools
 
+    @traced()
     async def initialize_tools(self, message):
-        server_params = StdioServerParameters(
-            command="python",
-            args=["rigel_mcp.py"],
-        )
-        
-        if not self._initialized:
-            self.syslog.log("Initializing tools...", level="INFO")
-            
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                self.tools = await load_mcp_tools(session)
-                self._initialized = True
-                self.syslog.log(f"Tools initialized: {len(self.tools)} tools loaded", level="INFO")
-                agent = create_react_agent(self.model, self.tools)
-                res = await agent.ainvoke({"messages": message})
-                self.syslog.log(f"Raw agent response: {res}", level="INFO")
-                return res['messages']
-
-    #     # self.tools = await load_mcp_tools(session)
-    #     # self._initialized = True
-    #     # self.syslog.log(f"Tools initialized: {len(self.tools)} tools loaded", level="INFO")
-
-
-    #     return self.tools
-
-    # async def run(self):
-    #     if not self._initialized:
-    #         await self.initialize_tools()
-    #     agent = create_react_agent(self.model, self.tools)
-    #     return agent
-            
-    # async def invoke(self, agent, message):
-    #     res = await agent.ainvoke({"messages": message})
-    #     return res
+        agent = await self._refresh_agent()
+        res = await agent.ainvoke({"messages": message})
+        # Lazy, the message dump is only rendered if INFO is on
+        self.syslog.log(lambda: f"Raw agent response: {res}", level="INFO")
+        # A generated tool only shows up once the server process is restarted
+        if any(getattr(m, 'name', None) == 'generate_tool' for m in res['messages'] if m.__class__.__name__ == 'ToolMessage'):
+            self.syslog.log("New tool generated, restarting MCP sessions", level="INFO")
+            await self.mcp_pool.restart_all()
+        return res['messages']
+
+    @traced()
+    async def stream_tools(self, message):
+        # Only the agent node's text is streamed out, tool traffic stays internal
+        agent = await self._refresh_agent()
+        generated_tool = False
+        async for chunk, metadata in agent.astream({"messages": message}, stream_mode="messages"):
+            if chunk.__class__.__name__ == 'ToolMessage':
+                generated_tool = generated_tool or getattr(chunk, 'name', None) == 'generate_tool'
+                continue
+            if metadata.get("langgraph_node") == "agent" and isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
+        if generated_tool:
+            self.syslog.log("New tool generated, restarting MCP sessions", level="INFO")
+            await self.mcp_pool.restart_all()
+
+    async def close(self):
+        await self.mcp_pool.close()
     
 class LanguageCortex:
-    def __init__(self, chroma_client=chromadb.PersistentClient(path="chromadb"), memory_collection_name="rigel_memory",research_collection_name="rigel_research"):
-        self.chroma_client = chroma_client
-        self.memory_target_collection = self.chroma_client.get_or_create_collection(name=memory_collection_name)
-        self.working_memory_collection = self.chroma_client.get_or_create_collection(name="working_memory")
-        self.embedding_function = DefaultEmbeddingFunction()
+    def __init__(self, chroma_client=None, memory_collection_name="rigel_memory",research_collection_name="rigel_research", id_allocator=None):
+        self.chroma_client = chroma_client or registry.get("chroma")
+        self.id_allocator = id_allocator or registry.get("id_allocator")
+        self.embedding_function = registry.get("embedding_function")
+        self.working_memory_collection = self.chroma_client.get_or_create_collection(name="working_memory", embedding_function=self.embedding_function)
+        self.memory_writer = registry.get("memory_writer")
+        self.scheduler = registry.get("llm_scheduler")
+        self.long_term_memory = TieredMemory(self.chroma_client, hot_collection_name=memory_collection_name,
+                                             embedding_function=self.embedding_function, id_allocator=self.id_allocator,
+                                             writer=self.memory_writer)
+        self.memory_target_collection = self.long_term_memory.hot
         self.model = 'Rigel'
+        # Working memory and its rolling summary are per session, long-term memory is shared
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._session_state()
         self.syslog = Syslog(log_file="logs/language_cortex.log")
         self.tools = []
         self.syslog.log("LanguageCortex initialized successfully.", level="INFO")
@@ -200,38 +368,56 @@ class LanguageCortex:
         if not api_key:
             self.syslog.log("GROQ_API_KEY not found in environment variables. Please set it in .env file.", level="ERROR")
             raise ValueError("GROQ_API_KEY not found. Please set it in .env file or environment variables.")
-        
-        self.client = Groq(api_key=api_key)
-
+        self._api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        # groq is only imported if something actually talks to it
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self._api_key)
+        return self._client
+
+    def _session_state(self, session_id=None):
+        session_id = session_id or current_session.get()
+        with self._sessions_lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                working_memory = WorkingMemory(window=10, ttl_minutes=30, collection=self.working_memory_collection,
+                                               id_allocator=self.id_allocator, writer=self.memory_writer, session_id=session_id)
+                # Older working-memory turns are folded into a summary by the model itself, off the hot path
+                context_assembler = ContextAssembler(summarizer=lambda prompt: self.ollama_call(prompt, RAG=False, persist=False,
+                                                                                               priority=BACKGROUND))
+                state = self._sessions[session_id] = (working_memory, context_assembler)
+            return state
+
+    @property
+    def working_memory(self):
+        return self._session_state()[0]
+
+    @property
+    def context_assembler(self):
+        return self._session_state()[1]
+
+    def drop_session(self, session_id):
+        # Rows already written expire on their own TTL
+        with self._sessions_lock:
+            self._sessions.pop(session_id, None)
+
+    @traced()
     def RAG(self, input, mode):
         if mode == "input":
             question = input[0]
             answer = input[1]
-            current_ids = self.memory_target_collection.get()['ids']
-            next_id = f"qa_{len(current_ids) + 1}"
-
-            self.memory_target_collection.add(
-                documents=[answer],
-                metadatas=[{"question": question, "answer": answer}],
-                ids=[next_id]
-            )
+            self.long_term_memory.add(question, answer)
 
         elif mode == "query":
             question = input
-            results = self.memory_target_collection.query(
-                query_texts=[question],
-                n_results=3,
-                include=["documents", "metadatas", "distances"]
-            )
-
             formatted_results = []
-            if results["documents"] and results["metadatas"]:
-                for doc, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0]):
-                    if distance > 3:
-                        continue
-
-                    question_meta = metadata.get("question", "Unknown Question")
-                    formatted_results.append(f"Question_User: {question_meta}\nAnswer_Rigel: {doc}")
+            for doc, metadata, distance in self.long_term_memory.query(question, n_results=3, max_distance=3):
+                question_meta = metadata.get("question", "Unknown Question")
+                formatted_results.append(f"Question_User: {question_meta}\nAnswer_Rigel: {doc}")
 
             if not formatted_results:
                 return "No relevant memory found."
@@ -239,44 +425,16 @@ class LanguageCortex:
             retrieved_text = "\n\n".join(formatted_results)
             return retrieved_text
 
+    @traced()
     def embedded_working_memory(self, input, mode="store", ttl_minutes=30):
         if mode == "store":
-            expiration_time = (datetime.now() + timedelta(minutes=ttl_minutes)).strftime("%Y-%m-%d %H:%M:%S.%f")
-            self.working_memory_collection.add(
-                documents=[input[0]],
-                metadatas=[{"question": input[0], "answer": input[1], "expiration_time": expiration_time, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")}],
-                ids=[f"working_{len(self.working_memory_collection.get()['ids']) + 1}"]
-            )
+            self.working_memory.store(input[0], input[1], ttl_minutes=ttl_minutes)
         elif mode == "query":
-            all_items = self.working_memory_collection.get()
-
-            if not all_items or len(all_items.get('ids', [])) == 0:
+            if self.working_memory.empty:
                 return "No working memory found."
 
-            memory_items = []
-            for idx, metadata in enumerate(all_items['metadatas']):
-                if idx >= len(all_items['documents']):
-                    continue
-
-                timestamp_str = metadata.get('timestamp', '0')
-                try:
-                    timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S.%f")
-                    expiration_time_str = metadata.get('expiration_time')
-
-                    if expiration_time_str and datetime.strptime(expiration_time_str, "%Y-%m-%d %H:%M:%S.%f") < datetime.now():
-                        continue
-
-                    question = metadata.get('question', 'Unknown question')
-                    answer = metadata.get('answer', all_items['documents'][idx])
-                    memory_items.append((timestamp, question, answer))
-                except (ValueError, TypeError):
-                    continue
-
-            memory_items.sort(key=lambda x: x[0])
-            latest_items = memory_items[-10:] if len(memory_items) > 10 else memory_items
-
             retrieved_text = ""
-            for _, question, answer in latest_items:
+            for question, answer in self.working_memory.query():
                 retrieved_text += f"Question_User: {question}\nAnswer_Rigel: {answer}\n\n"
 
             if not retrieved_text:
@@ -284,60 +442,86 @@ class LanguageCortex:
 
             return retrieved_text
         elif mode == "clear":
-            all_items = self.working_memory_collection.get()
-            current_time = datetime.now()
-
-            if not all_items or len(all_items.get('ids', [])) == 0:
-                return
-
-            ids_to_delete = []
-            for idx, metadata in enumerate(all_items.get('metadatas', [])):
-                if idx >= len(all_items['ids']):
-                    continue
-
-                expiration_time = metadata.get("expiration_time")
-                try:
-                    if expiration_time and datetime.strptime(str(expiration_time), "%Y-%m-%d %H:%M:%S.%f") < current_time:
-                        ids_to_delete.append(all_items['ids'][idx])
-                except (ValueError, TypeError):
-                    continue
-
-            if ids_to_delete:
-                self.working_memory_collection.delete(ids=ids_to_delete)
-
-    def ollama_call(self, question, RAG=False):
-        self.embedded_working_memory(None, mode="clear")
-
-        permanent_context = self.RAG(question, "query")
-        working_context = self.embedded_working_memory(question, mode="query")
+            self.working_memory.clear()
 
+    def _build_prompt(self, question, RAG):
         if RAG:
-            combined_context = ""
-            if working_context:
-                combined_context += f"Recent Working Memory Context:\n{working_context}\n\n"
-            if permanent_context and permanent_context != "No relevant memory found.":
-                combined_context += f"Context:\n{permanent_context}\n"
+            # Internal prompts (RAG=False) never look at memory, so don't pay for the lookups
+            self.embedded_working_memory(None, mode="clear")
+            working_turns = self.working_memory.query()
+            long_term_turns = [(metadata.get("question", "Unknown Question"), doc)
+                               for doc, metadata, _ in self.long_term_memory.query(question, n_results=3, max_distance=3)]
+            combined_context = self.context_assembler.assemble(working_turns, long_term_turns)
             if not combined_context:
                 combined_context = "No relevant context found."
         else:
             combined_context = ""
 
-        self.syslog.log(f"Combined Memory Context---------\n{combined_context}\n-------------", level="INFO")
+        # Context and prompt are the bulk of the log, whole only at DEBUG
+        self.syslog.log(lambda: f"Combined Memory Context---------\n{combined_context}\n-------------", level="DEBUG")
         if not combined_context:
             full_prompt = f"Question: {question}\nAnswer:"
         else:
             full_prompt = f"Memory Context:\n{combined_context}\n\nQuestion: {question}\nAnswer:"
-        self.syslog.log(full_prompt, level="INFO")
-
-        response: ChatResponse = chat(model=self.model, messages=[
-            {'role': 'user', 'content': full_prompt}
-        ])
-        self.memory_target_collection.add(
-            documents=[response.message['content']],
-            metadatas=[{"question": question, "answer": response.message['content']}],
-            ids=[f"qa_{len(self.memory_target_collection.get()['ids']) + 1}"]
-        )
-
-        self.embedded_working_memory([question, response.message['content']], mode="store")
-
-        return response.message['content']
\ No newline at end of file
+        self.syslog.log(lambda: f"Prompt built: {len(full_prompt)} chars, {len(combined_context)} of memory context",
+                        level="INFO")
+        self.syslog.log(lambda: full_prompt, level="DEBUG")
+        return full_prompt
+
+    @traced()
+    def ollama_call(self, question, RAG=False, persist=True, cancel_event=None, priority=INTERACTIVE):
+        if cancel_event is not None:
+            # Streamed so a speculative call can be abandoned between chunks
+            answer = "".join(self.ollama_stream(question, RAG=RAG, persist=persist, cancel_event=cancel_event, priority=priority))
+            return None if cancel_event.is_set() else answer
+
+        full_prompt = self._build_prompt(question, RAG)
+        with self.scheduler.slot("ollama", priority, tokens=count_tokens(full_prompt)):
+            response: ChatResponse = chat(model=self.model, messages=[
+                {'role': 'user', 'content': full_prompt}
+            ])
+        answer = response.message['content']
+
+        if persist:
+            self.remember(question, answer)
+
+        return answer
+
+    @traced()
+    def ollama_stream(self, question, RAG=False, persist=True, cancel_event=None, priority=INTERACTIVE):
+        # Yields tokens as Ollama produces them, memory is only written once the stream completes
+        full_prompt = self._build_prompt(question, RAG)
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        parts = []
+        # The slot is held until the last token, a half-read stream still occupies the model
+        with self.scheduler.slot("ollama", priority, tokens=count_tokens(full_prompt)):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            stream = chat(model=self.model, messages=[
+                {'role': 'user', 'content': full_prompt}
+            ], stream=True)
+            try:
+                for chunk in stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        self.syslog.log("Ollama call cancelled mid-generation", level="WARNING")
+                        return
+                    token = chunk.message['content']
+                    if token:
+                        parts.append(token)
+                        yield token
+            finally:
+                stream.close()
+
+        if persist:
+            self.remember(question, "".join(parts))
+
+    def remember(self, question, answer):
+        # Both writes are queued, the embedding and SQLite work happens on the writer thread
+        self.RAG([question, answer], "input")
+        self.embedded_working_memory([question, answer], mode="store")
+        self.syslog.log(f"Memory write queue depth: {self.memory_writer.depth}", level="INFO")
+
+    def close(self):
+        self.long_term_memory.close()
+        self.memory_writer.close()
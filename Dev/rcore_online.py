@@ -1,6 +1,6 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.prebuilt import create_react_agent
 import asyncio
+import os
 from langchain_groq import ChatGroq
 from langchain_core.messages import (
     HumanMessage,
@@ -9,6 +9,8 @@ from langchain_core.messages import (
 )
 from typing import List
 from dotenv import load_dotenv
+from tool_executor import ToolExecutor, create_parallel_react_agent
+from registry import registry
 
 load_dotenv()
 
@@ -18,12 +20,13 @@ class LanguageCortex_Online:
         self.client = MultiServerMCPClient(
             {
                 "rigel tools": {
-                    "url": "http://localhost:8001/sse",
+                    "url": os.environ.get("RIGEL_MCP_SSE_URL", "http://localhost:8001/sse"),
                     "transport": "sse",
                 }
             },
         )
         self.model = ChatGroq(model="llama3-70b-8192")
+        self.tool_executor = ToolExecutor.from_env()
         self.tools = None
         self.agent = None
         self._initialized = False
@@ -32,7 +35,8 @@ class LanguageCortex_Online:
         """Initialize the tools and agent asynchronously"""
         if not self._initialized:
             self.tools = await self.client.get_tools()
-            self.agent = create_react_agent(self.model, self.tools)
+            self.agent = create_parallel_react_agent(self.model, self.tools, self.tool_executor,
+                                                     scheduler=registry.get("llm_scheduler"), backend="groq")
             self._initialized = True
 
     async def online_call(self, input_text: str, RAG: bool = False) -> str:
@@ -41,4 +45,12 @@ class LanguageCortex_Online:
             await self.initialize()
         
         response = await self.agent.ainvoke({"messages": [HumanMessage(content=input_text)]})
-        return response["messages"][-1].content
\ No newline at end of file
+        return response["messages"][-1].content
+
+    async def online_stream(self, input_text: str, RAG: bool = False):
+        if not self._initialized:
+            await self.initialize()
+
+        async for chunk, metadata in self.agent.astream({"messages": [HumanMessage(content=input_text)]}, stream_mode="messages"):
+            if metadata.get("langgraph_node") == "agent" and isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
\ No newline at end of file
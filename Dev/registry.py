@@ -0,0 +1,167 @@
+import threading
+import time
+from contextlib import contextmanager
+from syslog import Syslog
+
+
+class ComponentRegistry:
+    """Builds each heavy component once, on first use, and hands out the shared instance.
+
+    Construction times (and any named startup phases) are recorded so the
+    cold-start cost can be reported per component. Each component is built
+    under its own lock, a slow build only holds up callers of that component.
+    """
+
+    def __init__(self):
+        self.syslog = Syslog(log_file="logs/registry.log")
+        self._factories = {}
+        self._instances = {}
+        self._timings = []
+        # Guards the bookkeeping only, never held while a factory runs
+        self._lock = threading.Lock()
+        self._building = {}
+        # Nesting depth of the builds in progress on this thread, for the report
+        self._local = threading.local()
+        self._created_at = time.perf_counter()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+
+    def override(self, name, instance):
+        # Swap in a stand-in (tests, load harness) before anything asks for the real one
+        with self._lock:
+            self._instances[name] = instance
+
+    def has(self, name):
+        return name in self._instances
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No component registered under '{name}'")
+            # Re-entrant, so a dependency cycle fails loudly instead of hanging
+            build_lock = self._building.setdefault(name, threading.RLock())
+        with build_lock:
+            if name in self._instances:
+                return self._instances[name]
+            depth = getattr(self._local, "depth", 0)
+            with self._lock:
+                # The slot is taken before building so dependencies are listed under their parent
+                slot = len(self._timings)
+                self._timings.append((name, 0.0, depth))
+            self._local.depth = depth + 1
+            started = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            finally:
+                self._local.depth = depth
+                with self._lock:
+                    self._timings[slot] = (name, time.perf_counter() - started, depth)
+            self._instances[name] = instance
+            return instance
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._timings.append((f"[{name}]", time.perf_counter() - started, 0))
+
+    def report(self):
+        # Nested components are indented under whatever first needed them; times are inclusive
+        lines = ["Startup timing report:"]
+        for name, seconds, depth in self._timings:
+            lines.append(f"  {'  ' * depth}{name:<28} {seconds * 1000:9.1f} ms")
+        lines.append(f"  {'total since registry created':<28} {(time.perf_counter() - self._created_at) * 1000:9.1f} ms")
+        report = "\n".join(lines)
+        self.syslog.log(report, level="INFO")
+        return report
+
+
+def _chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path="chromadb")
+
+
+def _id_allocator():
+    from id_allocator import IdAllocator
+    return IdAllocator("chromadb/id_counters.json")
+
+
+def _memory_writer():
+    from memory_writer import MemoryWriter
+    return MemoryWriter()
+
+
+def _embedding_function():
+    from embedding_cache import get_shared_embedding_function
+    return get_shared_embedding_function()
+
+
+def _language_cortex():
+    import rcore
+    return rcore.LanguageCortex()
+
+
+def _agentic_cortex():
+    import rcore
+    return rcore.AgenticCortex()
+
+
+def _prefrontal_cortex():
+    import rcore
+    return rcore.PreFrontalCortex()
+
+
+def _language_cortex_online():
+    from rcore_online import LanguageCortex_Online
+    return LanguageCortex_Online()
+
+
+def _vector_db():
+    from db_init import VectorDB
+    vector_db = VectorDB()
+    vector_db.loadDataToVectorDB()
+    return vector_db
+
+
+def _intent_router():
+    from intent_router import IntentRouter
+    return IntentRouter(embedding_function=registry.get("embedding_function"))
+
+
+def _synthesizer():
+    from voice_recognition_n_synth import Synthesizer
+    return Synthesizer()
+
+
+def _answer_cache():
+    from answer_cache import SemanticAnswerCache
+    return SemanticAnswerCache(registry.get("embedding_function"))
+
+
+def _llm_scheduler():
+    from llm_scheduler import LLMScheduler
+    return LLMScheduler.from_env()
+
+
+registry = ComponentRegistry()
+registry.register("chroma", _chroma_client)
+registry.register("id_allocator", _id_allocator)
+registry.register("memory_writer", _memory_writer)
+registry.register("embedding_function", _embedding_function)
+registry.register("language_cortex", _language_cortex)
+registry.register("agentic_cortex", _agentic_cortex)
+registry.register("prefrontal_cortex", _prefrontal_cortex)
+registry.register("language_cortex_online", _language_cortex_online)
+registry.register("vector_db", _vector_db)
+registry.register("intent_router", _intent_router)
+registry.register("synthesizer", _synthesizer)
+registry.register("answer_cache", _answer_cache)
+registry.register("llm_scheduler", _llm_scheduler)
@@ -0,0 +1,501 @@
+import argparse
+import ast
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ---------------------------------------------------------------- corpus
+
+_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[(\w+)\] (.*)$")
+_INPUT_RES = [re.compile(r"\[input:(.*?)\] available tools", re.S), re.compile(r'Input: "(.*?)"\n', re.S)]
+_TOOL_CALL_RE = re.compile(r"\{'name': '(\w+)', 'args': (\{.*?\}), 'id'")
+_INTERNAL_PROMPT_RE = re.compile(r"^(Yes or No|ANALYZE THIS INPUT|Current summary of the conversation)")
+
+
+def read_log(path):
+    """Yields (timestamp, message) for a Syslog file, plain or JSON lines, multi-line messages joined back together."""
+    if not os.path.exists(path):
+        return
+    current = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('{"ts"'):
+                # RIGEL_LOG_JSON output, one whole record per line
+                try:
+                    record = json.loads(line)
+                    if current:
+                        yield current
+                    current = (record["time"], record["message"])
+                    continue
+                except (ValueError, KeyError):
+                    pass
+            match = _LINE_RE.match(line.rstrip("\n"))
+            if match:
+                if current:
+                    yield current
+                current = (datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp(), match.group(3))
+            elif current:
+                current = (current[0], current[1] + "\n" + line.rstrip("\n"))
+    if current:
+        yield current
+
+
+def _tool_calls(message):
+    calls = []
+    for name, args in _TOOL_CALL_RE.findall(message):
+        try:
+            arguments = ast.literal_eval(args)
+        except (ValueError, SyntaxError):
+            arguments = {}
+        calls.append({"name": name, "args": arguments})
+    return calls
+
+
+def log_files(log_dir, name):
+    """<name>.log and its rotated backups (<name>.log.1 is the newest), oldest first."""
+    prefix = f"{name}.log."
+    backups = []
+    if os.path.isdir(log_dir):
+        for entry in os.listdir(log_dir):
+            if entry.startswith(prefix) and entry[len(prefix):].isdigit():
+                backups.append(int(entry[len(prefix):]))
+    return [os.path.join(log_dir, f"{prefix}{index}") for index in sorted(backups, reverse=True)] + \
+        [os.path.join(log_dir, f"{name}.log")]
+
+
+def build_corpus(log_dir):
+    """Turns the Rigel logs into a list of replayable turns.
+
+    A turn starts at a 'Received input' line of rigel_core.log, or at a
+    routing prompt in preftrontal_cortex.log when that log is missing. The
+    routing decision, the tool calls the agent made, the answer and the
+    latency recorded at the time are taken from the lines up to the next turn.
+    Rotated backups are read along with the live log.
+    """
+    events = []
+    for name in ("rigel_core", "preftrontal_cortex", "agentic_cortex", "language_cortex"):
+        for path in log_files(log_dir, name):
+            events.extend((ts, name, message) for ts, message in read_log(path))
+    events.sort(key=lambda event: event[0])
+
+    use_core = any(source == "rigel_core" and message.startswith("Received input:") for _, source, message in events)
+    turns = []
+    for ts, source, message in events:
+        text = None
+        if use_core and source == "rigel_core" and message.startswith("Received input:"):
+            text = message[len("Received input:"):].strip()
+        elif not use_core and source == "preftrontal_cortex" and message.startswith("Checking input:"):
+            for pattern in _INPUT_RES:
+                match = pattern.search(message)
+                if match:
+                    text = match.group(1).strip()
+                    break
+        if text:
+            turns.append({"ts": ts, "input": text, "route": "conversational", "online": False, "tools": [],
+                          "answer": None, "recorded_latency": None})
+            continue
+        if not turns:
+            continue
+        turn = turns[-1]
+        if source == "preftrontal_cortex":
+            routed = re.match(r"Input routed to '(\w+)'", message)
+            if routed:
+                turn["route"] = routed.group(1)
+            elif message.startswith("Input requires tool invocation") and turn["route"] != "syscom":
+                turn["route"] = "tool"
+            elif message.startswith("Input requires syscom context"):
+                turn["route"] = "syscom"
+        elif source == "agentic_cortex" and message.startswith("Raw agent response"):
+            turn["tools"].extend(_tool_calls(message))
+        elif source == "rigel_core" and message.startswith("Tool invocation response") and not turn["tools"]:
+            turn["tools"].extend(_tool_calls(message))
+        elif source == "language_cortex" and message.startswith("Online call response"):
+            turn["online"] = True
+        elif source == "rigel_core" and message.startswith("Response:") and turn["answer"] is None:
+            answer = message[len("Response:"):].strip()
+            if not answer.startswith("<"):
+                turn["answer"] = answer
+            turn["recorded_latency"] = ts - turn["ts"]
+    return turns
+
+
+def save_corpus(turns, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for turn in turns:
+            f.write(json.dumps(turn) + "\n")
+
+
+def load_corpus(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ---------------------------------------------------------------- stand-ins
+
+class StandIns:
+    """Local Ollama (/api/chat) and Groq (/openai/v1/chat/completions) stand-ins on one HTTP port.
+
+    Answers are looked up from the corpus: routing prompts get the route that
+    was logged for that input, agent prompts get the logged tool calls once
+    and then the logged answer. Latency is base + per_token * tokens.
+    """
+
+    def __init__(self, turns, ollama_latency=0.3, groq_latency=0.15, per_token=0.005):
+        self.by_input = {}
+        for turn in turns:
+            self.by_input.setdefault(turn["input"], turn)
+        # Longest first, so "what is ls" does not shadow "what is ls -la"
+        self._inputs = sorted(self.by_input, key=len, reverse=True)
+        self.ollama_latency = ollama_latency
+        self.groq_latency = groq_latency
+        self.per_token = per_token
+        self.calls = {"ollama": 0, "groq": 0}
+        self._http = None
+
+    def _turn_for(self, text):
+        for candidate in self._inputs:
+            if candidate in text:
+                return self.by_input[candidate]
+        return None
+
+    def reply(self, messages, tools):
+        """Returns (content, tool_calls) for a chat request."""
+        last = messages[-1] if messages else {}
+        content = last.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        user_text = " ".join(str(m.get("content") or "") for m in messages if m.get("role") == "user")
+        turn = self._turn_for(user_text) or {}
+        if re.search(r"YES or NO|Yes or No", content):
+            if "commandline level execution" in content:
+                return ("Yes" if turn.get("route") == "syscom" else "No"), []
+            return ("Yes" if turn.get("route") in ("tool", "syscom") else "No"), []
+        if tools and last.get("role") == "user" and turn.get("tools"):
+            available = {tool.get("function", tool).get("name") for tool in tools}
+            calls = [call for call in turn["tools"] if call["name"] in available]
+            if calls:
+                return "", calls
+        return turn.get("answer") or "This is a replayed answer from the stand-in model.", []
+
+    def _delay(self, base, content):
+        time.sleep(base + self.per_token * len(content.split()))
+
+    def serve(self, host="127.0.0.1", port=0):
+        stand_ins = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _json(self, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, content_type, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    data = chunk.encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                # Reachability probes and client version checks
+                self._json({"status": "ok", "version": "replay"})
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                path = self.path.split("?", 1)[0]
+                if path.endswith("/api/chat"):
+                    self._ollama(request)
+                elif path.endswith("/chat/completions"):
+                    self._groq(request)
+                else:
+                    self.send_error(404)
+
+            def _ollama(self, request):
+                stand_ins.calls["ollama"] += 1
+                content, calls = stand_ins.reply(request.get("messages", []), request.get("tools"))
+                stand_ins._delay(stand_ins.ollama_latency, content)
+                model = request.get("model", "Rigel")
+                created = datetime.utcnow().isoformat() + "Z"
+                message = {"role": "assistant", "content": content}
+                if calls:
+                    message["tool_calls"] = [{"function": {"name": call["name"], "arguments": call["args"]}} for call in calls]
+                if not request.get("stream", True):
+                    self._json({"model": model, "created_at": created, "message": message, "done": True, "done_reason": "stop"})
+                    return
+                words = re.findall(r"\S+\s*", content) or [""]
+                lines = [json.dumps({"model": model, "created_at": created, "message": {"role": "assistant", "content": word},
+                                     "done": False}) + "\n" for word in words[:-1]]
+                lines.append(json.dumps({"model": model, "created_at": created, "message": {**message, "content": words[-1]},
+                                         "done": True, "done_reason": "stop"}) + "\n")
+                self._stream("application/x-ndjson", lines)
+
+            def _groq(self, request):
+                stand_ins.calls["groq"] += 1
+                content, calls = stand_ins.reply(request.get("messages", []), request.get("tools"))
+                stand_ins._delay(stand_ins.groq_latency, content)
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                tool_calls = [{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                               "function": {"name": call["name"], "arguments": json.dumps(call["args"])}} for call in calls]
+                finish = "tool_calls" if tool_calls else "stop"
+                base = {"id": completion_id, "created": int(time.time()), "model": request.get("model", "replay")}
+                usage = {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+                if not request.get("stream"):
+                    message = {"role": "assistant", "content": content or None}
+                    if tool_calls:
+                        message["tool_calls"] = tool_calls
+                    self._json({**base, "object": "chat.completion", "usage": usage,
+                                "choices": [{"index": 0, "message": message, "finish_reason": finish}]})
+                    return
+                delta = {"role": "assistant", "content": content}
+                if tool_calls:
+                    delta["tool_calls"] = [{"index": i, **call} for i, call in enumerate(tool_calls)]
+                events = [f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n",
+                          f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish}], 'x_groq': {'usage': usage}})}\n\n",
+                          "data: [DONE]\n\n"]
+                self._stream("text/event-stream", events)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._http = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._http.serve_forever, name="replay-stand-ins", daemon=True).start()
+        return self._http.server_address
+
+    def close(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http = None
+
+
+# ---------------------------------------------------------------- replay
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(durations):
+    return {"count": len(durations), "p50": _percentile(durations, 50), "p95": _percentile(durations, 95),
+            "p99": _percentile(durations, 99)}
+
+
+def _prepare_workdir(workdir, dev_dir, online_url, mcp_latency):
+    os.makedirs(os.path.join(workdir, "logs"), exist_ok=True)
+    # The stores start empty every run, the command guide is shared read-only
+    data_dir = os.path.join(dev_dir, "data")
+    if os.path.isdir(data_dir) and not os.path.exists(os.path.join(workdir, "data")):
+        os.symlink(data_dir, os.path.join(workdir, "data"))
+    os.environ.update({
+        "OLLAMA_HOST": online_url,
+        "GROQ_BASE_URL": online_url,
+        "GROQ_API_BASE": online_url,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY") or "replay",
+        "RIGEL_MCP_SERVER": os.path.join(dev_dir, "replay_mcp.py"),
+        "RIGEL_REPLAY_MCP_LATENCY": str(mcp_latency),
+        "RIGEL_METRICS_PORT": "0",
+    })
+    os.chdir(workdir)
+
+
+async def replay(turns, rate=None, speedup=10.0, max_gap=5.0, concurrency=1):
+    """Replays the turns against RigelCore.getInput and returns per-stage durations and the wall time."""
+    from main import RigelCore
+    from registry import registry
+    from tracing import tracer
+    from voice_recognition_n_synth import SilentSynthesizer
+    from working_memory import current_session
+
+    stages = {}
+    lock = threading.Lock()
+
+    def collect(record):
+        with lock:
+            stages.setdefault(record["name"], []).append(record["duration"])
+
+    registry.override("synthesizer", SilentSynthesizer())
+    rigel_core = RigelCore()
+    await rigel_core.initialize()
+    tracer.subscribe(collect)
+    slots = asyncio.Semaphore(concurrency)
+    errors = []
+
+    async def run(index, turn):
+        async with slots:
+            started = time.perf_counter()
+            # Each worker slot keeps its own conversation, like separate kiosks
+            current_session.set(f"replay-{index % concurrency}")
+            try:
+                await rigel_core.getInput(turn["input"])
+            except Exception as e:
+                errors.append(f"{turn['input']}: {e}")
+            with lock:
+                stages.setdefault("turn", []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = []
+    try:
+        previous = None
+        for index, turn in enumerate(turns):
+            # Open loop: turns are released on schedule whether or not earlier ones finished
+            if rate:
+                delay = 1.0 / rate if index else 0.0
+            else:
+                delay = min(max_gap, max(0.0, turn["ts"] - previous) / speedup) if previous is not None else 0.0
+            previous = turn["ts"]
+            if delay:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(run(index, turn)))
+        await asyncio.gather(*tasks)
+    finally:
+        wall = time.perf_counter() - started
+        tracer.unsubscribe(collect)
+        await rigel_core.shutdown()
+    return stages, wall, errors
+
+
+def compare(results, baseline, tolerance=0.10, min_delta=0.005):
+    """Lists the stage percentiles that got slower than the baseline by more than tolerance."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        for key in ("p50", "p95", "p99"):
+            if current.get(key) is None or before.get(key) is None:
+                continue
+            if current[key] > before[key] * (1 + tolerance) and current[key] - before[key] > min_delta:
+                regressions.append({"stage": stage, "percentile": key, "baseline": before[key], "current": current[key]})
+    if baseline.get("throughput") and results["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append({"stage": "throughput", "percentile": "turns/s", "baseline": baseline["throughput"],
+                            "current": results["throughput"]})
+    return regressions
+
+
+def print_report(results, regressions):
+    print(f"\n{results['turns']} turns in {results['wall_seconds']:.2f}s, {results['throughput']:.2f} turns/s, "
+          f"{len(results['errors'])} errors")
+    print(f"{'stage':<48} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, summary in sorted(results["stages"].items(), key=lambda item: -(item[1]["p50"] or 0)):
+        cells = [f"{summary[key] * 1000:10.1f}" if summary[key] is not None else f"{'-':>10}" for key in ("p50", "p95", "p99")]
+        print(f"{stage:<48} {summary['count']:>6} {' '.join(cells)}")
+    for regression in regressions:
+        print(f"REGRESSION {regression['stage']} {regression['percentile']}: "
+              f"{regression['baseline']:.4f} -> {regression['current']:.4f}")
+
+
+def main():
+    dev_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build a replay corpus from the Rigel logs and replay it against stand-in backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="parse the logs into a corpus")
+    build.add_argument("--logs", default=os.path.join(dev_dir, "logs"))
+    build.add_argument("--out", default=os.path.join(dev_dir, "data", "replay_corpus.jsonl"))
+    run = sub.add_parser("run", help="replay a corpus against RigelCore.getInput")
+    run.add_argument("--corpus", default=os.path.join(dev_dir, "data", "replay_corpus.jsonl"))
+    run.add_argument("--rate", type=float, default=None, help="turns per second, default is the logged pacing sped up")
+    run.add_argument("--speedup", type=float, default=10.0)
+    run.add_argument("--concurrency", type=int, default=1)
+    run.add_argument("--limit", type=int, default=None)
+    run.add_argument("--online", action="store_true", help="let the network monitor see the online path as up")
+    run.add_argument("--ollama-latency", type=float, default=0.3)
+    run.add_argument("--groq-latency", type=float, default=0.15)
+    run.add_argument("--per-token", type=float, default=0.005)
+    run.add_argument("--mcp-latency", type=float, default=0.05)
+    run.add_argument("--workdir", default=None, help="scratch directory for stores and logs, default a fresh temp dir")
+    run.add_argument("--out", default=None, help="write the results as JSON")
+    run.add_argument("--baseline", default=None, help="compare against (or, with --save-baseline, write) this file")
+    run.add_argument("--save-baseline", action="store_true")
+    run.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        turns = build_corpus(args.logs)
+        save_corpus(turns, args.out)
+        routes = {}
+        for turn in turns:
+            routes[turn["route"]] = routes.get(turn["route"], 0) + 1
+        print(f"{len(turns)} turns written to {args.out} {routes}")
+        return 0
+
+    turns = load_corpus(os.path.abspath(args.corpus))[:args.limit]
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    out_path = os.path.abspath(args.out) if args.out else None
+    stand_ins = StandIns(turns, args.ollama_latency, args.groq_latency, args.per_token)
+    host, port = stand_ins.serve()
+    url = f"http://{host}:{port}"
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rigel_replay_")
+    sse_server = None
+    # Offline runs point the monitor at a port nothing listens on
+    os.environ["RIGEL_NETWORK_TARGET"] = f"{host}:{port}" if args.online else "127.0.0.1:1"
+    if args.online:
+        sse_port = port + 1
+        os.environ["RIGEL_REPLAY_MCP_PORT"] = str(sse_port)
+        os.environ["RIGEL_MCP_SSE_URL"] = f"http://127.0.0.1:{sse_port}/sse"
+        sse_server = subprocess.Popen([sys.executable, os.path.join(dev_dir, "replay_mcp.py"), "sse"],
+                                      env={**os.environ, "RIGEL_REPLAY_MCP_LATENCY": str(args.mcp_latency)})
+        time.sleep(1.0)
+    sys.path.insert(0, dev_dir)
+    _prepare_workdir(workdir, dev_dir, url, args.mcp_latency)
+    try:
+        stages, wall, errors = asyncio.run(replay(turns, args.rate, args.speedup, concurrency=args.concurrency))
+    finally:
+        stand_ins.close()
+        if sse_server is not None:
+            sse_server.terminate()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {"turns": len(turns), "wall_seconds": wall, "throughput": len(turns) / wall if wall else 0.0,
+               "errors": errors, "backend_calls": stand_ins.calls,
+               "settings": {key: getattr(args, key) for key in ("rate", "speedup", "concurrency", "online", "ollama_latency",
+                                                                 "groq_latency", "per_token", "mcp_latency")},
+               "stages": {stage: summarize(durations) for stage, durations in stages.items()}}
+    regressions = []
+    if baseline_path and args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    elif baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    results["regressions"] = regressions
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    print_report(results, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
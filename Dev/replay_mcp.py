@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import time
+from mcp.server.fastmcp import FastMCP
+from tool_cache import ToolResultCache
+
+# Stand-in for rigel_mcp.py during replay: the same tool names, signatures and docstrings (they
+# end up in the agent's prompt, keep them in step), but nothing is executed, every call just
+# costs RIGEL_REPLAY_MCP_LATENCY seconds
+mcp = FastMCP("RigelTools")
+tool_cache = ToolResultCache()
+LATENCY = float(os.environ.get("RIGEL_REPLAY_MCP_LATENCY", "0.05"))
+
+
+def _answer(tool, **arguments):
+    time.sleep(LATENCY)
+    return f"[replay] {tool} {arguments}"
+
+
+@mcp.tool()
+def execute_system_command(command: str) -> str:
+    """Execute Commands in System Level."""
+    return _answer("execute_system_command", command=command)
+
+@mcp.tool()
+def open_file(file_path: str, line_number: int = None) -> str:
+    return _answer("open_file", file_path=file_path, line_number=line_number)
+
+@mcp.tool()
+def count_words(text: str) -> int:
+    """Counts the number of words in a sentence."""
+    time.sleep(LATENCY)
+    return len(text.split())
+
+@mcp.tool()
+def current_time() -> str:
+    """Returns the current time."""
+    time.sleep(LATENCY)
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+@mcp.tool()
+def tool_cache_stats() -> str:
+    """Returns hit/miss statistics of the tool result cache."""
+    time.sleep(LATENCY)
+    return json.dumps(tool_cache.stats(), indent=2)
+
+@mcp.tool()
+def generate_tool(tool_name: str, description: str, parameters: str = "", return_type: str = "str", tool_body: str = "") -> str:
+    """Generate a new tool and add it to the current file.
+    
+    Args:
+        tool_name: Name of the new tool function
+        description: Description of what the tool does
+        parameters: Function parameters (e.g., "text: str, count: int = 1")
+        return_type: Return type annotation (default: "str")
+        tool_body: The actual implementation code of the tool
+    
+    Returns:
+        Status message indicating success or failure
+    """
+    return _answer("generate_tool", tool_name=tool_name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "sse":
+        mcp.settings.port = int(os.environ.get("RIGEL_REPLAY_MCP_PORT", "8001"))
+        mcp.run(transport="sse")
+    else:
+        mcp.run(transport="stdio")
@@ -1,11 +1,18 @@
 from mcp.server.fastmcp import FastMCP
 import os
 import mimetypes
+import json
 from voice_recognition_n_synth import Synthesizer
+from tool_cache import ToolResultCache, content_policy, file_stat_policy, readonly_command_policy
 mcp = FastMCP("RigelTools")
 synth = Synthesizer()
+tool_cache = ToolResultCache(
+    max_entries=int(os.environ.get("RIGEL_TOOL_CACHE_ENTRIES", "512")),
+    max_bytes=int(os.environ.get("RIGEL_TOOL_CACHE_BYTES", str(8 * 1024 * 1024))),
+)
 
 @mcp.tool()
+@tool_cache.cached(readonly_command_policy())
 def execute_system_command(command: str) -> str:
     """Execute Commands in System Level."""
     import subprocess
@@ -62,6 +69,7 @@ def execute_system_command(command: str) -> str:
         return f"Error executing command: {str(e)}"
     
 @mcp.tool()
+@tool_cache.cached(file_stat_policy())
 def open_file(file_path: str, line_number: int = None) -> str:
     try:
         if not os.path.exists(file_path):
@@ -116,6 +124,7 @@ def open_file(file_path: str, line_number: int = None) -> str:
         return f"Error opening file '{file_path}': {str(e)}"
     
 @mcp.tool()
+@tool_cache.cached(content_policy())
 def count_words(text: str) -> int:
     """Counts the number of words in a sentence."""
     return len(text.split())
@@ -126,6 +135,11 @@ def current_time() -> str:
     from datetime import datetime
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+@mcp.tool()
+def tool_cache_stats() -> str:
+    """Returns hit/miss statistics of the tool result cache."""
+    return json.dumps(tool_cache.stats(), indent=2)
+
 @mcp.tool()
 def generate_tool(tool_name: str, description: str, parameters: str = "", return_type: str = "str", tool_body: str = "") -> str:
     """Generate a new tool and add it to the current file.
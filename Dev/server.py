@@ -0,0 +1,312 @@
+import asyncio
+import json
+import os
+import re
+import signal
+import time
+import uuid
+from syslog import Syslog
+from working_memory import current_session
+from tracing import tracer
+
+
+_SESSION_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class RigelServer:
+    """Serves one RigelCore to many clients over plain HTTP.
+
+    POST /v1/turn takes {"session": ..., "input": ..., "stream": bool} and
+    answers with JSON, or with newline-delimited JSON tokens when streaming.
+    Each session has its own working memory and its turns run one at a time.
+    At most max_concurrency turns run at once, at most max_queue wait behind
+    them, and anything beyond that is turned away with a 503 straight away.
+    A client that disconnects cancels its turn, and shutdown stops accepting,
+    lets in-flight turns finish (up to drain_timeout) and then closes the core.
+    """
+
+    def __init__(self, rigel_core, host="127.0.0.1", port=8765, max_concurrency=4, max_queue=16,
+                 session_ttl=1800.0, drain_timeout=30.0, max_body=64 * 1024, header_timeout=10.0):
+        self.syslog = Syslog(log_file="logs/server.log")
+        self.rigel_core = rigel_core
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.session_ttl = session_ttl
+        self.drain_timeout = drain_timeout
+        self.max_body = max_body
+        self.header_timeout = header_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._inflight = set()
+        self._session_locks = {}
+        # Turns queued or running per session, a session is only dropped while it has none
+        self._session_turns = {}
+        self._session_seen = {}
+        self._draining = False
+        self._server = None
+        self._reaper = None
+        self.stats = {"turns": 0, "rejected": 0, "cancelled": 0, "errors": 0}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._reaper = asyncio.create_task(self._reap_sessions())
+        self.syslog.log(f"Rigel server listening on {self.host}:{self.port}", level="INFO")
+
+    async def shutdown(self):
+        self._draining = True
+        if self._server is not None:
+            self._server.close()
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._inflight:
+            self.syslog.log(f"Draining {len(self._inflight)} in-flight turn(s)", level="INFO")
+            _, pending = await asyncio.wait(set(self._inflight), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.syslog.log(f"Cancelled {len(pending)} turn(s) still running after {self.drain_timeout}s", level="WARNING")
+                await asyncio.gather(*pending, return_exceptions=True)
+        await self.rigel_core.shutdown()
+        self.syslog.log("Rigel server stopped.", level="INFO")
+
+    async def _reap_sessions(self):
+        # Idle sessions give back their in-process working memory, the rows expire on their own
+        while True:
+            await asyncio.sleep(min(60.0, self.session_ttl))
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id, seen in list(self._session_seen.items()):
+                if seen < cutoff and not self._session_turns.get(session_id):
+                    self._drop_session(session_id)
+
+    def _drop_session(self, session_id):
+        self._session_seen.pop(session_id, None)
+        self._session_locks.pop(session_id, None)
+        self.rigel_core.language_cortex.drop_session(session_id)
+
+    async def _read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.header_timeout)
+        except asyncio.LimitOverrunError:
+            raise _HttpError(413, "Headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise _HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length > self.max_body:
+            raise _HttpError(413, "Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _send(self, writer, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_text(self, writer, status, text):
+        body = text.encode("utf-8")
+        writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                      f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_chunk(self, writer, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, headers, body = await self._read_request(reader)
+                if path == "/healthz":
+                    await self._send(writer, 200, self.health())
+                elif path == "/metrics":
+                    await self._send_text(writer, 200, tracer.prometheus())
+                elif path == "/v1/turn":
+                    if method != "POST":
+                        raise _HttpError(405, "Use POST")
+                    await self._turn(reader, writer, headers, body)
+                elif path.startswith("/v1/sessions/"):
+                    if method != "DELETE":
+                        raise _HttpError(405, "Use DELETE")
+                    session_id = path.rsplit("/", 1)[1]
+                    # Dropping the lock under a running turn would let the next request run beside it
+                    if self._session_turns.get(session_id):
+                        raise _HttpError(409, "Session has a turn in progress", {"Retry-After": "1"})
+                    self._drop_session(session_id)
+                    await self._send(writer, 200, {"dropped": True})
+                else:
+                    raise _HttpError(404, "Not found")
+            except _HttpError as e:
+                await self._send(writer, e.status, {"error": str(e)}, e.headers)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            self.syslog.log(f"Request failed: {e}", level="ERROR")
+        finally:
+            writer.close()
+
+    def _parse_turn(self, headers, body):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise _HttpError(400, "Body must be JSON")
+        text = request.get("input")
+        if not isinstance(text, str) or not text.strip():
+            raise _HttpError(400, "'input' is required")
+        session_id = request.get("session") or headers.get("x-rigel-session") or uuid.uuid4().hex
+        if not _SESSION_RE.match(str(session_id)):
+            raise _HttpError(400, "Invalid session id")
+        return str(session_id), text, bool(request.get("stream", False))
+
+    async def _turn(self, reader, writer, headers, body):
+        session_id, text, stream = self._parse_turn(headers, body)
+        if self._draining:
+            raise _HttpError(503, "Shutting down", {"Retry-After": "5"})
+        if self._waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise _HttpError(503, "Server busy", {"Retry-After": "1"})
+
+        # The turn runs in its own task so a disconnect seen on the socket can cancel it,
+        # queued or running. The task gets its own copy of the context, and so its own session
+        turn = asyncio.create_task(self._run_turn(session_id, text, stream, writer))
+        self._inflight.add(turn)
+        turn.add_done_callback(self._inflight.discard)
+        watch = asyncio.create_task(self._client_gone(reader, writer))
+        try:
+            done, _ = await asyncio.wait({turn, watch}, return_when=asyncio.FIRST_COMPLETED)
+            if turn not in done:
+                self.stats["cancelled"] += 1
+                self.syslog.log(f"Client for session '{session_id}' went away, cancelling its turn", level="WARNING")
+                turn.cancel()
+            await asyncio.gather(turn, return_exceptions=True)
+        finally:
+            watch.cancel()
+
+    async def _client_gone(self, reader, writer):
+        # Returns once the client is known to be gone. Stray bytes after the body are read and ignored,
+        # and EOF alone may just be a half-close by a client still waiting for its answer, so after it
+        # only a reset or the transport closing (a failed write) counts
+        try:
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            return
+        while not writer.is_closing():
+            await asyncio.sleep(0.5)
+
+    async def _run_turn(self, session_id, text, stream, writer):
+        current_session.set(session_id)
+        self._session_seen[session_id] = time.monotonic()
+        self._session_turns[session_id] = self._session_turns.get(session_id, 0) + 1
+        try:
+            await self._locked_turn(session_id, text, stream, writer)
+        finally:
+            self._session_turns[session_id] -= 1
+            if not self._session_turns[session_id]:
+                del self._session_turns[session_id]
+
+    async def _locked_turn(self, session_id, text, stream, writer):
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        self._waiting += 1
+        try:
+            # One turn per session at a time, and a session waits on its own lock before taking a slot
+            await lock.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                lock.release()
+                raise
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        try:
+            self.stats["turns"] += 1
+            if stream:
+                await self._stream_turn(session_id, text, writer)
+            else:
+                try:
+                    answer = await self.rigel_core.getInput(text)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    self.syslog.log(f"Turn failed for session '{session_id}': {e}", level="ERROR")
+                    await self._send(writer, 500, {"error": str(e), "session": session_id})
+                    return
+                await self._send(writer, 200, {"answer": answer, "session": session_id}, {"X-Rigel-Session": session_id})
+        finally:
+            self._running -= 1
+            self._slots.release()
+            lock.release()
+            self._session_seen[session_id] = time.monotonic()
+
+    async def _stream_turn(self, session_id, text, writer):
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n"
+                      f"X-Rigel-Session: {session_id}\r\nConnection: close\r\n\r\n").encode("latin-1"))
+        parts = []
+        stream = self.rigel_core.getInput_stream(text)
+        try:
+            async for token in stream:
+                parts.append(token)
+                await self._send_chunk(writer, {"token": token})
+            await self._send_chunk(writer, {"done": True, "answer": "".join(parts), "session": session_id})
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.syslog.log(f"Streaming turn failed for session '{session_id}': {e}", level="ERROR")
+            await self._send_chunk(writer, {"error": str(e), "session": session_id})
+        finally:
+            await stream.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def health(self):
+        return {"status": "draining" if self._draining else "ok", "running": self._running, "queued": self._waiting,
+                "sessions": len(self._session_seen), **self.stats}
+
+
+async def serve():
+    from main import RigelCore
+    from registry import registry
+    from voice_recognition_n_synth import SilentSynthesizer
+    # Clients do their own speech, tool turns must not play audio on (or share output.wav of) the server box
+    registry.override("synthesizer", SilentSynthesizer())
+    rigel_core = RigelCore()
+    await rigel_core.initialize()
+    server = RigelServer(rigel_core,
+                         host=os.environ.get("RIGEL_SERVER_HOST", "127.0.0.1"),
+                         port=int(os.environ.get("RIGEL_SERVER_PORT", "8765")),
+                         max_concurrency=int(os.environ.get("RIGEL_SERVER_CONCURRENCY", "4")),
+                         max_queue=int(os.environ.get("RIGEL_SERVER_QUEUE", "16")))
+    await server.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
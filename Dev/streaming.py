@@ -0,0 +1,118 @@
+import asyncio
+import queue
+import re
+import threading
+
+
+class SentenceSegmenter:
+    """Buffers streamed tokens and hands back whole sentences as soon as they are complete."""
+
+    _BOUNDARY = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+    _ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "st.", "no."}
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, candidate):
+        last_word = candidate.rsplit(None, 1)[-1].lower() if candidate else ""
+        return last_word in self._ABBREVIATIONS or re.fullmatch(r'[a-z]\.', last_word) is not None
+
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in self._BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            # Too short or an abbreviation, keep it and merge with what follows
+            if not candidate or len(candidate) < self.min_chars or self._is_abbreviation(candidate):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest
+
+
+class _StreamFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+class ThreadedStream:
+    """Drives a blocking generator on a worker thread and exposes it as an async iterator.
+
+    The worker starts immediately, so items are produced (and buffered) even
+    before anyone iterates, which is what speculative execution relies on.
+    """
+
+    _DONE = object()
+
+    def __init__(self, factory):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._cancelled = threading.Event()
+        self._task = asyncio.ensure_future(asyncio.to_thread(self._produce, factory))
+
+    def _put(self, item):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def _produce(self, factory):
+        generator = factory()
+        try:
+            for item in generator:
+                if self._cancelled.is_set():
+                    break
+                self._put(item)
+        except Exception as e:
+            self._put(_StreamFailure(e))
+        finally:
+            generator.close()
+            self._put(self._DONE)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is self._DONE:
+            raise StopAsyncIteration
+        if isinstance(item, _StreamFailure):
+            raise item.error
+        return item
+
+
+class SpeechStream:
+    """Speaks sentences on a worker thread while the producer keeps streaming tokens."""
+
+    def __init__(self, speak, min_chars=12):
+        self.segmenter = SentenceSegmenter(min_chars=min_chars)
+        self._sentences = queue.Queue()
+        self._worker = threading.Thread(target=self._run, args=(speak,), daemon=True)
+        self._worker.start()
+
+    def _run(self, speak):
+        while True:
+            sentence = self._sentences.get()
+            if sentence is None:
+                break
+            speak(sentence)
+
+    def feed(self, text):
+        for sentence in self.segmenter.feed(text):
+            self._sentences.put(sentence)
+
+    def close(self):
+        # Blocks until everything queued so far has been spoken
+        rest = self.segmenter.flush()
+        if rest:
+            self._sentences.put(rest)
+        self._sentences.put(None)
+        self._worker.join()
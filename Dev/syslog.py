@@ -1,25 +1,200 @@
+import atexit
+import json
 import os
+import queue
 import sys
+import threading
 import time
 import colorama
 
 
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+_COLORS = {"ERROR": colorama.Fore.RED, "CRITICAL": colorama.Fore.RED, "WARNING": colorama.Fore.YELLOW}
+
+colorama.init(autoreset=True)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class _LogWriter:
+    """The one thread that touches log files and the console.
+
+    Records arrive on a bounded queue and are written in batches, each file is
+    kept open and flushed once per batch and rotated once it outgrows its
+    Syslog's max_bytes. When the queue is full, records below WARNING are
+    dropped (and counted) rather than stalling the caller.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=512):
+        self.batch_size = batch_size
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._files = {}
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._thread = threading.Thread(target=self._run, name="syslog-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        try:
+            if LEVELS.get(record[1], 20) >= LEVELS["WARNING"]:
+                self._queue.put(record, timeout=1.0)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Whatever piled up while the last batch was written goes out together
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Syslog writer failed: {e}", file=sys.stderr)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        console = []
+        touched = {}
+        for created, level, message, logger in batch:
+            line = logger.format(created, level, message)
+            if logger.log_file:
+                handle = self._file(logger.log_file)
+                handle.write(line + "\n")
+                touched[logger.log_file] = logger
+            if logger.console:
+                # The terminal always gets the plain form
+                plain = logger.format(created, level, message, plain=True) if logger.json_lines else line
+                console.append(_COLORS.get(level, colorama.Fore.GREEN) + plain)
+        for path, logger in touched.items():
+            handle = self._files[path]
+            handle.flush()
+            if logger.max_bytes and handle.tell() >= logger.max_bytes:
+                self._rotate(path, logger.backups)
+        if self.dropped != self._reported_dropped:
+            console.append(colorama.Fore.YELLOW + f"[WARNING] {self.dropped - self._reported_dropped} log record(s) dropped, queue full")
+            self._reported_dropped = self.dropped
+        if console:
+            print("\n".join(console))
+
+    def _file(self, path):
+        handle = self._files.get(path)
+        if handle is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handle = self._files[path] = open(path, 'a', encoding='utf-8')
+        return handle
+
+    def _rotate(self, path, backups):
+        # logs/x.log -> logs/x.log.1 -> ... -> logs/x.log.<backups>, the oldest falls off
+        self._files.pop(path).close()
+        if backups <= 0:
+            os.remove(path)
+            return
+        for index in range(backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{index}"):
+                os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+        os.replace(path, f"{path}.1")
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    # A forked child gets a copy of the queue but not the thread, so it starts its own
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = _LogWriter(max_queue=_env_int("RIGEL_LOG_QUEUE", 10000))
+    return _writer
+
+
+def flush():
+    # Blocks until everything logged so far is on disk
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.flush()
+
+
+@atexit.register
+def _close():
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.close()
+
+
 class Syslog:
-    def __init__(self, log_file=None):
+    """Queue-backed logger, log() only formats the payload and hands it to the writer thread.
+
+    Defaults come from the environment: RIGEL_LOG_LEVEL, RIGEL_LOG_MAX_BYTES and
+    RIGEL_LOG_BACKUPS for rotation, RIGEL_LOG_JSON=1 for JSON lines,
+    RIGEL_LOG_CONSOLE=0 to stop echoing to the terminal, and RIGEL_LOG_MAX_CHARS
+    with RIGEL_LOG_LARGE (truncate, sample or keep) for oversized payloads.
+    Sampling keeps one large payload in RIGEL_LOG_SAMPLE_EVERY whole and
+    truncates the rest. Truncation is off unless RIGEL_LOG_MAX_CHARS is set,
+    replay parses the full agent and tool dumps out of these logs, so the
+    bulky payloads (prompts, memory context) are logged whole only at DEBUG.
+    """
+
+    def __init__(self, log_file=None, level=None, max_bytes=None, backups=None, json_lines=None, console=None,
+                 max_chars=None, large=None, sample_every=None):
         self.log_file = log_file
-        colorama.init(autoreset=True)
+        self.level = LEVELS.get((level or os.environ.get("RIGEL_LOG_LEVEL", "INFO")).upper(), LEVELS["INFO"])
+        self.max_bytes = max_bytes if max_bytes is not None else _env_int("RIGEL_LOG_MAX_BYTES", 5 * 1024 * 1024)
+        self.backups = backups if backups is not None else _env_int("RIGEL_LOG_BACKUPS", 3)
+        self.json_lines = json_lines if json_lines is not None else os.environ.get("RIGEL_LOG_JSON", "0") == "1"
+        self.console = console if console is not None else os.environ.get("RIGEL_LOG_CONSOLE", "1") == "1"
+        self.max_chars = max_chars if max_chars is not None else _env_int("RIGEL_LOG_MAX_CHARS", 0)
+        self.large = large or os.environ.get("RIGEL_LOG_LARGE", "truncate")
+        self.sample_every = max(1, sample_every or _env_int("RIGEL_LOG_SAMPLE_EVERY", 10))
+        self._large_seen = 0
+
+    def enabled(self, level="INFO"):
+        return LEVELS.get(level, LEVELS["INFO"]) >= self.level
+
+    def _shrink(self, message):
+        if not self.max_chars or len(message) <= self.max_chars or self.large == "keep":
+            return message
+        if self.large == "sample":
+            self._large_seen += 1
+            if (self._large_seen - 1) % self.sample_every == 0:
+                return message
+        # Head and tail, the middle of a prompt or message dump is the least telling part
+        half = self.max_chars // 2
+        return f"{message[:half]} ...[{len(message) - 2 * half} chars truncated]... {message[-half:]}"
+
+    def format(self, created, level, message, plain=False):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+        if self.json_lines and not plain:
+            return json.dumps({"ts": timestamp, "time": created, "level": level, "message": message}, ensure_ascii=False)
+        return f"{timestamp} [{level}] {message}"
 
     def log(self, message, level="INFO"):
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        formatted_message = f"{timestamp} [{level}] {message}"
-
-        if self.log_file:
-            with open(self.log_file, 'a') as f:
-                f.write(formatted_message + '\n')
-
-        if level == "ERROR":
-            print(colorama.Fore.RED + formatted_message)
-        elif level == "WARNING":
-            print(colorama.Fore.YELLOW + formatted_message)
-        else:
-            print(colorama.Fore.GREEN + formatted_message)
\ No newline at end of file
+        if LEVELS.get(level, LEVELS["INFO"]) < self.level:
+            return
+        # A callable is only evaluated once the level is known to be on
+        if callable(message):
+            message = message()
+        _get_writer().submit((time.time(), level, self._shrink(str(message)), self))
@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+# The Dev modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _scratch_cwd(tmp_path, monkeypatch):
+    # Syslog writes logs/<name>.log relative to the working directory, keep the tree's logs clean
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,25 @@
+import unittest
+from chunker import chunk_text, stitch
+
+
+class ChunkerTests(unittest.TestCase):
+
+    def test_heading_opens_the_long_section_after_it(self):
+        # The entry line is a boundary of its own, so the heading alone is a 9 character section
+        body = " ".join(f"sets the mode bits of file {i}." for i in range(60))
+        text = f"## chmod\nchmod - {body}\n"
+        chunks = chunk_text(text, max_chars=400, overlap=60, min_chars=100)
+        self.assertGreater(len(chunks), 1)
+        self.assertNotIn("## chmod", [chunk for _, _, chunk in chunks])
+        self.assertTrue(chunks[0][2].startswith("## chmod\nchmod - sets"))
+
+    def test_offsets_and_stitch_cover_the_page(self):
+        text = "## ls\nlist directory contents\n## chmod\n" + "change file mode bits " * 80
+        chunks = chunk_text(text, max_chars=300, overlap=50, min_chars=80)
+        for start, end, chunk in chunks:
+            self.assertEqual(text[start:end], chunk)
+        self.assertEqual(" ".join(stitch(chunks).split()), " ".join(text.split()))
+
+
+if __name__ == "__main__":
+    unittest.main()
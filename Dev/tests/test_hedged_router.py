@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+from hedged_router import HedgedRouter, Backend
+
+
+def _backend(reply, delay=0.0, error=None, calls=None):
+    async def call(input):
+        if calls is not None:
+            calls.append(input)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return reply
+    return Backend(call=call)
+
+
+class HedgedRouterTests(unittest.TestCase):
+
+    def _router(self, primary, secondary):
+        # No exploration, so the preference order is the order tried
+        return HedgedRouter({"online": primary, "local": secondary}, min_hedge_delay=0.05,
+                            max_hedge_delay=0.05, explore_every=0)
+
+    def test_slow_primary_is_hedged(self):
+        router = self._router(_backend("online", delay=1.0), _backend("local"))
+        self.assertEqual(asyncio.run(router.call("hi", hedge=True)), "local")
+        self.assertEqual(router.stats["hedges"], 1)
+        self.assertEqual(router.stats["cancelled"], 1)
+        # The cancelled loser is censored, not a latency sample
+        self.assertEqual(router.trackers["call"]["online"].snapshot()["count"], 0)
+        self.assertEqual(router.trackers["call"]["online"].snapshot()["censored"], 1)
+
+    def test_failing_primary_fails_over(self):
+        router = self._router(_backend("online", error=RuntimeError("429")), _backend("local"))
+        self.assertEqual(asyncio.run(router.call("hi", hedge=True)), "local")
+        self.assertEqual(router.stats["failovers"], 1)
+        self.assertEqual(router.trackers["call"]["online"].error_rate(), 1.0)
+
+    def test_hedge_disabled_neither_hedges_nor_fails_over(self):
+        local_calls = []
+        router = self._router(_backend("online", delay=0.2), _backend("local", calls=local_calls))
+        self.assertEqual(asyncio.run(router.call("hi", hedge=False)), "online")
+        router = self._router(_backend("online", error=RuntimeError("boom")), _backend("local", calls=local_calls))
+        with self.assertRaises(RuntimeError):
+            asyncio.run(router.call("run ls", hedge=False))
+        # The request may already have run a tool on the primary, it is never repeated
+        self.assertEqual(local_calls, [])
+        self.assertEqual(router.stats["hedges"] + router.stats["failovers"], 0)
+
+    def test_failover_without_hedging(self):
+        router = self._router(_backend("online", error=RuntimeError("down")), _backend("local"))
+        self.assertEqual(asyncio.run(router.call("hi", hedge=False, failover=True)), "local")
+
+
+if __name__ == "__main__":
+    unittest.main()
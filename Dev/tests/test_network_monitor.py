@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from network_monitor import ConnectivityMonitor
+
+
+async def _listen(port=0):
+    async def handle(reader, writer):
+        writer.close()
+    return await asyncio.start_server(handle, "127.0.0.1", port)
+
+
+async def _stop(server):
+    server.close()
+    await server.wait_closed()
+
+
+class ConnectivityMonitorTests(unittest.TestCase):
+
+    def test_up_down_up_against_local_listener(self):
+        async def scenario():
+            server = await _listen()
+            port = server.sockets[0].getsockname()[1]
+            monitor = ConnectivityMonitor(f"127.0.0.1:{port}", interval=0.05, timeout=0.5,
+                                          up_threshold=2, down_threshold=2)
+            await monitor.start()
+            try:
+                self.assertTrue(monitor.online)
+
+                await _stop(server)
+                # One failed probe is not enough to flip the state
+                await monitor.check_now()
+                self.assertTrue(monitor.online)
+                await monitor.check_now()
+                self.assertFalse(monitor.online)
+
+                server = await _listen(port)
+                await monitor.check_now()
+                self.assertFalse(monitor.online)
+                await monitor.check_now()
+                self.assertTrue(monitor.online)
+                self.assertEqual(monitor.stats["transitions"], 2)
+            finally:
+                await monitor.stop()
+                await _stop(server)
+
+        asyncio.run(scenario())
+
+    def test_background_loop_survives_errors(self):
+        async def scenario():
+            server = await _listen()
+            port = server.sockets[0].getsockname()[1]
+            monitor = ConnectivityMonitor(f"127.0.0.1:{port}", interval=0.02, timeout=0.5,
+                                          up_threshold=1, down_threshold=1)
+            await monitor.start()
+            real_probe = monitor.probe
+            failures = []
+
+            async def broken_probe():
+                if not failures:
+                    failures.append(True)
+                    raise RuntimeError("probe crashed")
+                return await real_probe()
+
+            monitor.probe = broken_probe
+            try:
+                await _stop(server)
+                # The loop keeps going after the crash and picks up the outage on its own
+                for _ in range(100):
+                    if not monitor.online:
+                        break
+                    await asyncio.sleep(0.02)
+                self.assertTrue(failures)
+                self.assertFalse(monitor.online)
+                self.assertFalse(monitor._task.done())
+            finally:
+                await monitor.stop()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shlex
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+# Read-only commands whose output is safe to reuse for a short while, in seconds
+READONLY_COMMAND_TTLS = {
+    "uname": 3600,
+    "hostname": 3600,
+    "whoami": 3600,
+    "id": 3600,
+    "nproc": 3600,
+    "lsb_release": 3600,
+    "pwd": 60,
+    "ls": 5,
+    "cat": 5,
+    "head": 5,
+    "tail": 5,
+    "wc": 5,
+    "df": 10,
+    "du": 10,
+    "free": 5,
+    "uptime": 5,
+    "lscpu": 3600,
+    "lsblk": 30,
+    "which": 300,
+}
+
+
+class ToolResultCache:
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "uncacheable": 0}
+        self._per_tool = {}
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, str):
+            return len(value.encode("utf-8", errors="ignore"))
+        return sys.getsizeof(value)
+
+    def _count(self, tool_name, outcome):
+        self._stats[outcome] += 1
+        tool_stats = self._per_tool.setdefault(tool_name, {"hits": 0, "misses": 0})
+        if outcome in tool_stats:
+            tool_stats[outcome] += 1
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, tool_name="unknown"):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count(tool_name, "misses")
+                return None, False
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                self._count(tool_name, "misses")
+                return None, False
+            self._entries.move_to_end(key)
+            self._count(tool_name, "hits")
+            return value, True
+
+    def put(self, key, value, ttl=None):
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "per_tool": {name: dict(counts) for name, counts in self._per_tool.items()},
+            }
+
+    def cached(self, policy):
+        """Wraps a tool so results are reused according to policy(tool_name, arguments) -> (key, ttl).
+
+        A policy returning a None key marks that particular call as uncacheable.
+        """
+        def decorator(func):
+            tool_name = func.__name__
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # Bind first so positional and keyword calls share a key
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key, ttl = policy(tool_name, dict(bound.arguments))
+                if key is None:
+                    with self._lock:
+                        self._stats["uncacheable"] += 1
+                    return func(*args, **kwargs)
+                value, hit = self.get(key, tool_name)
+                if hit:
+                    return value
+                value = func(*args, **kwargs)
+                # Failures (timeouts, missing commands) are worth retrying, never replayed from cache
+                if isinstance(value, str) and value.startswith("Error"):
+                    return value
+                self.put(key, value, ttl)
+                return value
+            return wrapper
+        return decorator
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def content_policy(ttl=None):
+    # Pure tools, the arguments alone determine the result
+    def policy(tool_name, arguments):
+        return _digest(tool_name, arguments), ttl
+    return policy
+
+
+def file_stat_policy(path_arg="file_path", ttl=300):
+    # Keyed on the file's identity and mtime/size, so an edit is a miss without any TTL games
+    def policy(tool_name, arguments):
+        file_path = arguments.get(path_arg)
+        if not file_path:
+            return None, None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None, None
+        return _digest(tool_name, os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, arguments), ttl
+    return policy
+
+
+def readonly_command_policy(command_arg="command", ttls=READONLY_COMMAND_TTLS):
+    # Only allowlisted read-only commands are cached, everything else always runs
+    def policy(tool_name, arguments):
+        command = arguments.get(command_arg) or ""
+        try:
+            parts = shlex.split(command)
+        except ValueError:
+            return None, None
+        if not parts:
+            return None, None
+        ttl = ttls.get(os.path.basename(parts[0]))
+        if not ttl:
+            return None, None
+        return _digest(tool_name, os.getcwd(), parts), ttl
+    return policy
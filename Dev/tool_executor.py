@@ -0,0 +1,151 @@
+import asyncio
+import os
+from langchain_core.messages import ToolMessage
+from syslog import Syslog
+from tracing import traced, span
+
+
+# Tools with side effects the next call may depend on, they run on their own between batches
+SERIAL_TOOLS = frozenset({"generate_tool"})
+# Reply tokens assumed for a model step before the backend reports the real count
+COMPLETION_ESTIMATE = 256
+
+
+def _parse_overrides(value, cast):
+    # "execute_system_command=2,open_file=8"
+    overrides = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            name, setting = part.split("=", 1)
+            overrides[name.strip()] = cast(setting)
+    return overrides
+
+
+class ToolExecutor:
+    """Runs the tool calls of one model step concurrently.
+
+    Each tool has its own concurrency limit and timeout, results come back as
+    ToolMessages in the order the model asked for them. A failing or timed out
+    call becomes an error message for the model instead of failing the turn.
+    Calls to SERIAL_TOOLS wait for everything before them and hold back
+    everything after them.
+    """
+
+    def __init__(self, default_limit=4, default_timeout=60.0, limits=None, timeouts=None, serial_tools=SERIAL_TOOLS):
+        self.syslog = Syslog(log_file="logs/tool_executor.log")
+        self.default_limit = default_limit
+        self.default_timeout = default_timeout
+        self.limits = dict(limits or {})
+        self.timeouts = dict(timeouts or {})
+        self.serial_tools = set(serial_tools)
+        self._semaphores = {}
+        self.stats = {"batches": 0, "calls": 0, "parallel_calls": 0, "timeouts": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(default_limit=int(os.environ.get("RIGEL_TOOL_CONCURRENCY", "4")),
+                   default_timeout=float(os.environ.get("RIGEL_TOOL_TIMEOUT", "60")),
+                   limits=_parse_overrides(os.environ.get("RIGEL_TOOL_LIMITS"), int),
+                   timeouts=_parse_overrides(os.environ.get("RIGEL_TOOL_TIMEOUTS"), float))
+
+    def _semaphore(self, name):
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(self.limits.get(name, self.default_limit))
+        return semaphore
+
+    async def _call(self, tool_call, tools_by_name):
+        name = tool_call["name"]
+        tool = tools_by_name.get(name)
+        if tool is None:
+            return ToolMessage(content=f"Error: {name} is not a valid tool, try one of [{', '.join(tools_by_name)}].",
+                               name=name, tool_call_id=tool_call["id"], status="error")
+        timeout = self.timeouts.get(name, self.default_timeout)
+        async with self._semaphore(name):
+            try:
+                # Invoked with the full tool call so the tool hands back a ToolMessage, artifacts included
+                return await asyncio.wait_for(tool.ainvoke({**tool_call, "type": "tool_call"}), timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self.syslog.log(f"Tool call {name} timed out after {timeout}s", level="WARNING")
+                return ToolMessage(content=f"Error: {name} timed out after {timeout} seconds.", name=name,
+                                   tool_call_id=tool_call["id"], status="error")
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.syslog.log(f"Tool call {name} failed: {e}", level="ERROR")
+                return ToolMessage(content=f"Error: {e!r}\n Please fix your mistakes.", name=name,
+                                   tool_call_id=tool_call["id"], status="error")
+
+    def _batches(self, tool_calls):
+        batch = []
+        for tool_call in tool_calls:
+            if tool_call["name"] in self.serial_tools:
+                if batch:
+                    yield batch
+                yield [tool_call]
+                batch = []
+            else:
+                batch.append(tool_call)
+        if batch:
+            yield batch
+
+    @traced()
+    async def run(self, tool_calls, tools_by_name):
+        results = []
+        for batch in self._batches(tool_calls):
+            self.stats["batches"] += 1
+            self.stats["calls"] += len(batch)
+            if len(batch) > 1:
+                self.stats["parallel_calls"] += len(batch)
+            with span("tool_batch", size=len(batch)):
+                # gather keeps the order of its arguments, whatever order they finish in
+                results.extend(await asyncio.gather(*(self._call(tool_call, tools_by_name) for tool_call in batch)))
+        return results
+
+
+def create_parallel_react_agent(model, tools, executor=None, scheduler=None, backend=None, rate_limit_retries=2):
+    """A ReAct loop like langgraph.prebuilt.create_react_agent, with the tool node swapped
+    for a ToolExecutor. The nodes keep the prebuilt names, so streaming callers that pick
+    out the "agent" node's tokens work unchanged. With a scheduler, every model step
+    takes an interactive slot on backend first."""
+    from langgraph.graph import StateGraph, MessagesState, START, END
+    from llm_scheduler import INTERACTIVE
+    from context_assembler import count_tokens
+
+    executor = executor or ToolExecutor.from_env()
+    tools_by_name = {tool.name: tool for tool in tools}
+    bound_model = model.bind_tools(tools) if tools else model
+
+    async def agent(state):
+        if scheduler is None:
+            return {"messages": [await bound_model.ainvoke(state["messages"])]}
+        # Prompt plus room for the reply, settled against the reported usage afterwards
+        estimate = sum(count_tokens(str(message.content)) for message in state["messages"]) + COMPLETION_ESTIMATE
+        for attempt in range(rate_limit_retries + 1):
+            async with scheduler.aslot(backend, INTERACTIVE, tokens=estimate) as ticket:
+                try:
+                    message = await bound_model.ainvoke(state["messages"])
+                except Exception as e:
+                    retry_after = scheduler.retry_after(e)
+                    if retry_after is None or attempt == rate_limit_retries:
+                        raise
+                    # Everyone queued on this backend backs off, not just this turn
+                    scheduler.pause(backend, retry_after)
+                    continue
+                usage = getattr(message, "usage_metadata", None) or {}
+                ticket.used(usage.get("total_tokens"))
+                return {"messages": [message]}
+
+    async def run_tools(state):
+        return {"messages": await executor.run(state["messages"][-1].tool_calls, tools_by_name)}
+
+    def next_step(state):
+        return "tools" if getattr(state["messages"][-1], "tool_calls", None) else END
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("agent", agent)
+    graph.add_node("tools", run_tools)
+    graph.add_edge(START, "agent")
+    graph.add_conditional_edges("agent", next_step, ["tools", END])
+    graph.add_edge("tools", "agent")
+    return graph.compile()
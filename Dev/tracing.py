@@ -0,0 +1,201 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Seconds, spread from an embedding cache hit up to a long agent loop
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+current_trace = contextvars.ContextVar("rigel_trace", default=None)
+_current_span = contextvars.ContextVar("rigel_span", default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+class Tracer:
+    """Span timings per stage, a trace id per turn, and Prometheus-style histograms.
+
+    Spans opened while another is open (on the same task, or on a thread
+    started with asyncio.to_thread) become its children and share its trace id.
+    Finished spans are optionally appended to a JSON-lines file.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, trace_file=None):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._trace_file = None
+        self._http = None
+        self._listeners = []
+        if trace_file:
+            self.dump_to(trace_file)
+
+    def dump_to(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._trace_file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    @contextmanager
+    def span(self, name, new_trace=False, **attributes):
+        trace_token = None
+        trace_id = current_trace.get()
+        if new_trace or trace_id is None:
+            trace_id = uuid.uuid4().hex[:16]
+            trace_token = current_trace.set(trace_id)
+        parent = _current_span.get()
+        span_id = uuid.uuid4().hex[:8]
+        span_token = _current_span.set(span_id)
+        started_at = time.time()
+        started = time.perf_counter()
+        error = None
+        status = "ok"
+        try:
+            yield trace_id
+        except (GeneratorExit, asyncio.CancelledError):
+            # Abandoned streams and losing hedges are not failures
+            status = "cancelled"
+            raise
+        except BaseException as e:
+            error = e
+            status = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            try:
+                _current_span.reset(span_token)
+                if trace_token is not None:
+                    current_trace.reset(trace_token)
+            except ValueError:
+                # An async generator closed from another context (e.g. by the GC), nothing to restore
+                pass
+            self._record(name, duration, error, {"trace_id": trace_id, "span_id": span_id, "parent_id": parent,
+                                                  "name": name, "start": started_at, "duration": duration,
+                                                  "status": status,
+                                                  **attributes})
+
+    def subscribe(self, callback):
+        # callback(record) for every finished span, called on whichever thread finished it
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _record(self, name, duration, error, record):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram(self.buckets)
+            histogram.counts[bisect.bisect_left(self.buckets, duration)] += 1
+            histogram.sum += duration
+            histogram.count += 1
+            if error is not None:
+                histogram.errors += 1
+            if self._trace_file is not None:
+                self._trace_file.write(json.dumps(record, default=str) + "\n")
+        for callback in list(self._listeners):
+            callback(record)
+
+    def traced(self, name=None, new_trace=False):
+        """Decorator for plain functions, generators, coroutines and async generators."""
+        def decorate(function):
+            span_name = name or function.__qualname__
+            if inspect.isasyncgenfunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.span(span_name, new_trace):
+                        async for item in function(*args, **kwargs):
+                            yield item
+            elif inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.span(span_name, new_trace):
+                        yield from function(*args, **kwargs)
+            elif inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.span(span_name, new_trace):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.span(span_name, new_trace):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {"count": h.count, "sum": h.sum, "errors": h.errors, "buckets": list(h.counts)}
+                    for name, h in self._histograms.items()}
+
+    def prometheus(self):
+        lines = ["# HELP rigel_span_duration_seconds Time spent in each traced stage.",
+                 "# TYPE rigel_span_duration_seconds histogram"]
+        errors = ["# HELP rigel_span_errors_total Traced stages that raised.",
+                  "# TYPE rigel_span_errors_total counter"]
+        for name, h in sorted(self.snapshot().items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), h["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'rigel_span_duration_seconds_bucket{{span="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'rigel_span_duration_seconds_sum{{span="{label}"}} {h["sum"]:.6f}')
+            lines.append(f'rigel_span_duration_seconds_count{{span="{label}"}} {h["count"]}')
+            errors.append(f'rigel_span_errors_total{{span="{label}"}} {h["errors"]}')
+        return "\n".join(lines + errors) + "\n"
+
+    def serve_metrics(self, host="127.0.0.1", port=9464):
+        # Local scrape endpoint on its own thread, so it answers even while the loop is busy
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._http = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._http.serve_forever, name="metrics-http", daemon=True).start()
+        return self._http.server_address[1]
+
+    def close(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http = None
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+tracer = Tracer(trace_file=os.environ.get("RIGEL_TRACE_FILE"))
+traced = tracer.traced
+span = tracer.span
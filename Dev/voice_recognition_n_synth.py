@@ -1,6 +1,9 @@
 # import vosk
 import os
+import asyncio
 from syslog import Syslog
+from tracing import traced
+from streaming import SpeechStream
 # import sounddevice as sd
 
 
@@ -12,8 +15,31 @@ class Synthesizer:
         self.syslog.log("Synthesizer initialized successfully.")
 
 
+    @traced()
     def run_synth(self, synthesis):
         # Escape single quotes in synthesis text to prevent shell conflicts
         escaped_synthesis = synthesis.replace("'", "'\"'\"'")
         print(escaped_synthesis)
-        os.system(f"echo '{escaped_synthesis}' | python3.9 -m piper --model voice_model_data/jarvis-medium.onnx --output_file output.wav && paplay output.wav")
\ No newline at end of file
+        os.system(f"echo '{escaped_synthesis}' | python3.9 -m piper --model voice_model_data/jarvis-medium.onnx --output_file output.wav && paplay output.wav")
+
+    async def speak_stream(self, tokens):
+        # Speech starts as soon as the first sentence is complete, returns the full text
+        speech = SpeechStream(self.run_synth)
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                speech.feed(token)
+        finally:
+            await asyncio.to_thread(speech.close)
+        return "".join(parts)
+
+
+class SilentSynthesizer:
+    """Takes the synthesizer's place wherever speech must not play on this machine (server, load tests)."""
+
+    def run_synth(self, synthesis):
+        pass
+
+    async def speak_stream(self, tokens):
+        return "".join([token async for token in tokens])
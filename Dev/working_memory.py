@@ -0,0 +1,103 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+DEFAULT_SESSION = "default"
+# The conversation the current turn belongs to. The server sets it per request, the CLI stays on the default
+current_session = contextvars.ContextVar("rigel_session", default=DEFAULT_SESSION)
+
+
+class WorkingMemory:
+    """Short-lived conversational memory kept in a ring buffer.
+
+    Expiry is lazy and uses plain epoch floats, so nothing is parsed on the hot
+    path. When a collection is given every store is written through to Chroma
+    and the buffer is rebuilt from it on startup. Each session gets its own
+    instance, rows are tagged with the session so recovery stays per session.
+    """
+
+    def __init__(self, window=10, ttl_minutes=30, collection=None, id_allocator=None, writer=None, purge_interval=60.0,
+                 session_id=DEFAULT_SESSION):
+        self.session_id = session_id
+        self.window = window
+        self.ttl_minutes = ttl_minutes
+        self.collection = collection
+        self.id_allocator = id_allocator
+        self.writer = writer
+        self.purge_interval = purge_interval
+        self._items = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._stored_any = False
+        self._last_purge = 0.0
+        if self.collection is not None:
+            self._recover()
+
+    def _recover(self):
+        # Startup only, also sweeps rows written before expires_at existed
+        if self.session_id == DEFAULT_SESSION:
+            # Rows written before sessions existed carry no tag and belong to the default session
+            all_items = self.collection.get(include=["metadatas"])
+        else:
+            all_items = self.collection.get(where={"session": self.session_id}, include=["metadatas"])
+        now = time.time()
+        recovered = []
+        stale_ids = []
+        for item_id, metadata in zip(all_items.get('ids', []), all_items.get('metadatas', [])):
+            metadata = metadata or {}
+            if metadata.get("session", DEFAULT_SESSION) != self.session_id:
+                continue
+            expires_at = metadata.get("expires_at")
+            if expires_at is None:
+                try:
+                    expires_at = datetime.strptime(str(metadata.get("expiration_time")), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+                except (ValueError, TypeError):
+                    expires_at = 0.0
+            if expires_at < now:
+                stale_ids.append(item_id)
+                continue
+            recovered.append((metadata.get("created_at", expires_at), expires_at,
+                              metadata.get("question", "Unknown question"), metadata.get("answer", "")))
+        recovered.sort(key=lambda item: item[0])
+        for _, expires_at, question, answer in recovered[-self.window:]:
+            self._items.append((expires_at, question, answer))
+        self._stored_any = bool(recovered)
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+        self._last_purge = time.monotonic()
+
+    def store(self, question, answer, ttl_minutes=None):
+        now = time.time()
+        expires_at = now + (ttl_minutes or self.ttl_minutes) * 60
+        with self._lock:
+            self._items.append((expires_at, question, answer))
+            self._stored_any = True
+        if self.collection is not None:
+            metadata = {"question": question, "answer": answer, "expires_at": expires_at, "created_at": now,
+                        "session": self.session_id}
+            item_id = self.id_allocator.next_id(self.collection, "working")
+            if self.writer is not None:
+                self.writer.submit(self.collection, question, metadata, item_id)
+            else:
+                self.collection.add(documents=[question], metadatas=[metadata], ids=[item_id])
+
+    def query(self):
+        now = time.time()
+        with self._lock:
+            return [(question, answer) for expires_at, question, answer in self._items if expires_at >= now]
+
+    def clear(self):
+        now = time.time()
+        with self._lock:
+            while self._items and self._items[0][0] < now:
+                self._items.popleft()
+        # The persisted copy is swept with a filtered delete every so often, never a full scan
+        if self.collection is not None and time.monotonic() - self._last_purge > self.purge_interval:
+            self._last_purge = time.monotonic()
+            self.collection.delete(where={"expires_at": {"$lt": now}})
+
+    @property
+    def empty(self):
+        return not self._stored_any